@@ -0,0 +1,63 @@
+"""
+Synthetic pypm.toml documents for the benchmarks: dependencies with versions and markers in inline tables,
+long multiline strings, deeply nested dotted tables and a number of other tables.
+
+    python -m benchmarks.corpus [--deps 1000] [--tables 100] [--string-size 4096] [--depth 8] > pypm.toml
+"""
+import argparse
+
+LICENSE_LINE = 'THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED.\n'
+MARKERS = ["python_version >= '3.5'", "sys_platform == 'linux'", "platform_machine == 'x86_64'"]
+
+
+def _dependency_line(i: int) -> str:
+    if i % 3 == 0:
+        return 'package{i} = "=={i}.0"'.format(i=i)
+
+    if i % 3 == 1:
+        return 'package{i} = {{version = ">={i}.0,<{next}.0"}}'.format(i=i, next=i + 1)
+
+    return 'package{i} = {{version = "=={i}.1", markers = "{markers}"}}'.format(i=i, markers=MARKERS[i % 9 // 3])
+
+
+def make_pypm_document(n_deps: int = 1000, n_tables: int = 100, string_size: int = 4096, depth: int = 8) -> str:
+    lines = ['name = "synthetic-project"',
+             'version = "1.0.0"',
+             '# the license is embedded as a long multiline string',
+             'license = """' + LICENSE_LINE * max(1, string_size // len(LICENSE_LINE)) + '"""',
+             '',
+             '[deps]']
+    # most of the dependencies are production ones
+    n_dev_deps = n_deps // 5
+    lines.extend(_dependency_line(i) for i in range(n_deps - n_dev_deps))
+
+    lines.extend(['', '[dev_deps]'])
+    lines.extend(_dependency_line(i) for i in range(n_deps - n_dev_deps, n_deps))
+
+    for i in range(n_tables):
+        lines.extend(['', '[tool.component{i}]'.format(i=i),
+                      'enabled = true',
+                      'paths = ["src/component{i}", "tests/component{i}"]'.format(i=i),
+                      'description = "component {i} with \\"quoted\\" words and\\ttabs"'.format(i=i)])
+
+    name = 'nested'
+    for level in range(depth):
+        name += '.level{level}'.format(level=level)
+        lines.extend(['', '[{name}]'.format(name=name), 'value = {level}'.format(level=level)])
+
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--deps', type=int, default=1000)
+    arg_parser.add_argument('--tables', type=int, default=100)
+    arg_parser.add_argument('--string-size', type=int, default=4096)
+    arg_parser.add_argument('--depth', type=int, default=8)
+    args = arg_parser.parse_args()
+
+    print(make_pypm_document(args.deps, args.tables, args.string_size, args.depth), end='')
+
+
+if __name__ == '__main__':
+    main()
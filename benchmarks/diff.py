@@ -0,0 +1,34 @@
+"""
+Time to diff two versions of a big document, which differ in a single keyword: first run (content hashes
+of the tables are computed) and the next ones (hashes are reused).
+
+    python -m benchmarks.diff [--tables 100] [--entries 100] [--repeat 5]
+"""
+import argparse
+import timeit
+
+from benchmarks.memory import make_document
+from pip_save.toml import diff
+from pip_save.toml.assemble import parse_toml
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--tables', type=int, default=100)
+    arg_parser.add_argument('--entries', type=int, default=100)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    text = make_document(args.tables, args.entries)
+    changed_text = text.replace('[deps{i}]\n'.format(i=args.tables // 2),
+                                '[deps{i}]\nadded = "==1.0"\n'.format(i=args.tables // 2))
+    pairs = [(parse_toml(text), parse_toml(changed_text)) for _ in range(args.repeat)]
+
+    first_run = min(timeit.timeit(lambda: list(diff(root_a, root_b)), number=1) for root_a, root_b in pairs)
+    next_runs = min(timeit.timeit(lambda: list(diff(root_a, root_b)), number=1) for root_a, root_b in pairs)
+    print('{lines} lines, first diff: {first:.2f} ms, next diffs: {next:.2f} ms'.format(
+        lines=text.count('\n'), first=first_run * 1000, next=next_runs * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Writer throughput: long string values with and without escapes, and a document of many tables with
+the same keys (like version and markers of every dependency), which is formatted from scratch and then
+again after a change of one value.
+
+    python -m benchmarks.format_values [--size 1048576] [--tables 1000] [--repeat 5]
+"""
+import argparse
+import io
+import timeit
+
+from pip_save.toml.assemble import parse_toml
+from pip_save.toml.writer import format_value, to_toml
+
+
+def make_dependencies_document(n_tables: int) -> str:
+    lines = []
+    for i in range(n_tables):
+        lines.append('[component{i}.deps]'.format(i=i))
+        lines.append('django = {{version = "=={i}.0", markers = "python_version >= \'3.5\'"}}'.format(i=i))
+        lines.append('flask = {version = "==0.11"}')
+        lines.append('"zope.interface" = "==4.3"')
+
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--size', type=int, default=1024 * 1024)
+    arg_parser.add_argument('--tables', type=int, default=1000)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    cases = [
+        ('string without escapes', 'THE SOFTWARE IS PROVIDED AS IS, WITHOUT WARRANTY OF ANY KIND. ' * (args.size // 63)),
+        ('string with escapes', 'C:\\templates\t"quoted"\n' * (args.size // 23)),
+    ]
+    for name, value in cases:
+        best = min(timeit.repeat(lambda: format_value(value), number=1, repeat=args.repeat))
+        print('{name}: {total:.4f} s, {throughput:.1f} MB/s'
+              .format(name=name, total=best, throughput=len(value) / best / 1024 / 1024))
+
+    # parsed from a file object, the document has no original text and every statement is formatted
+    root = parse_toml(io.StringIO(make_dependencies_document(args.tables)))
+    def format_from_scratch():
+        root.formatted_statements.clear()
+        return to_toml(root)
+
+    best = min(timeit.repeat(format_from_scratch, number=1, repeat=args.repeat))
+    print('{n} tables formatted: {total:.4f} s'.format(n=args.tables, total=best))
+
+    def change_and_format():
+        root['component0']['deps']['django'] = '==2.0'
+        return to_toml(root)
+
+    best = min(timeit.repeat(change_and_format, number=1, repeat=args.repeat))
+    print('{n} tables formatted again after a change: {total:.4f} s'.format(n=args.tables, total=best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Memory held by a parsed document, in bytes per statement, measured with tracemalloc.
+
+    python -m benchmarks.memory [--tables 100] [--entries 100]
+"""
+import argparse
+import gc
+import tracemalloc
+
+from pip_save.toml.assemble import parse_toml
+
+
+def make_document(n_tables: int, n_entries: int) -> str:
+    lines = ['name = "memory"']
+    for i in range(n_tables):
+        lines.append('[deps{i}]'.format(i=i))
+        lines.append('# dependencies of the component {i}'.format(i=i))
+        for j in range(n_entries):
+            lines.append('package{j} = "=={j}.0"'.format(j=j))
+
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--tables', type=int, default=100)
+    arg_parser.add_argument('--entries', type=int, default=100)
+    args = arg_parser.parse_args()
+
+    text = make_document(args.tables, args.entries)
+    n_statements = 1 + args.tables * (args.entries + 2)
+
+    gc.collect()
+    tracemalloc.start()
+    root = parse_toml(text)
+    gc.collect()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print('{n} statements: {held:.0f} bytes per statement held, {peak:.0f} bytes per statement at peak'
+          .format(n=n_statements, held=held / n_statements, peak=peak / n_statements))
+    return root
+
+
+if __name__ == '__main__':
+    main()
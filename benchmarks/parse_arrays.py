@@ -0,0 +1,47 @@
+"""
+Per-array parsing cost for arrays and inline tables of different sizes.
+
+    python -m benchmarks.parse_arrays [--statements 1000] [--repeat 5]
+"""
+import argparse
+import timeit
+
+from pip_save.toml.parser import parse_value
+from pip_save.toml.source import Source
+
+SIZES = [1, 10, 10000]
+
+
+def make_array(n_items: int) -> str:
+    return '[' + ', '.join(str(i) for i in range(n_items)) + ']'
+
+
+def make_inline_table(n_items: int) -> str:
+    return '{' + ', '.join('key{i} = {i}'.format(i=i) for i in range(n_items)) + '}'
+
+
+def _parse_all(texts):
+    for text in texts:
+        parse_value(Source(text))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--statements', type=int, default=1000,
+                            help='number of values parsed per size, scaled down for the big ones')
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    for name, make_value in [('array', make_array), ('inline table', make_inline_table)]:
+        for size in SIZES:
+            n_values = max(1, args.statements // size)
+            texts = [make_value(size)] * n_values
+            best = min(timeit.repeat(lambda: _parse_all(texts), number=1, repeat=args.repeat))
+            print('{name} of {size} items: {per_value:.2f} us per {name}, {per_item:.3f} us per item'
+                  .format(name=name, size=size,
+                          per_value=best / n_values * 1e6,
+                          per_item=best / n_values / size * 1e6))
+
+
+if __name__ == '__main__':
+    main()
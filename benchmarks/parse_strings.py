@@ -0,0 +1,45 @@
+"""
+String parsing throughput on pathological inputs: 1 MB multiline strings (like embedded
+license texts) and strings dense with quotes and escapes.
+
+    python -m benchmarks.parse_strings [--size 1048576] [--repeat 5]
+"""
+import argparse
+import timeit
+
+from pip_save.toml.parser import parse_value
+from pip_save.toml.source import Source
+
+LICENSE_LINE = 'THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED.\n'
+
+
+def _repeat_to_size(chunk: str, size: int) -> str:
+    return chunk * max(1, size // len(chunk))
+
+
+def make_cases(size: int):
+    license_text = _repeat_to_size(LICENSE_LINE, size)
+    return [
+        ('multiline basic string', '"""' + license_text + '"""'),
+        ('multiline literal string', "'''" + license_text + "'''"),
+        ('multiline string with escapes', '"""' + _repeat_to_size('tab\\there \\"quoted\\"\n', size) + '"""'),
+        ('multiline string dense with quotes', '"""' + _repeat_to_size('a"b""', size) + 'c"""'),
+        ('basic string', '"' + _repeat_to_size('x' * 99 + ' ', size) + '"'),
+        ('basic string dense with escapes', '"' + _repeat_to_size('\\"', size) + '"'),
+    ]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--size', type=int, default=1024 * 1024)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    for name, text in make_cases(args.size):
+        best = min(timeit.repeat(lambda: parse_value(Source(text)), number=1, repeat=args.repeat))
+        print('{name}: {total:.4f} s, {throughput:.1f} MB/s'
+              .format(name=name, total=best, throughput=len(text) / best / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Per-value parsing cost for a document of scalar values.
+
+    python -m benchmarks.parse_values [--values 10000] [--repeat 5]
+"""
+import argparse
+import timeit
+
+from pip_save.toml.assemble import parse_statements
+
+SCALARS = ['1', '-1_000', '3.1415', '6.02e23', 'true', 'false',
+           '"==1.10.2"', '"escaped \\"string\\""', "'C:\\templates'", '"""multi\nline"""']
+
+
+def make_document(n_values: int) -> str:
+    lines = ['[values]']
+    for i in range(n_values):
+        lines.append('value{i} = {val}'.format(i=i, val=SCALARS[i % len(SCALARS)]))
+
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--values', type=int, default=10000)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    text = make_document(args.values)
+    best = min(timeit.repeat(lambda: parse_statements(text), number=1, repeat=args.repeat))
+    print('{n} values: {total:.4f} s total, {per_value:.2f} us per value'
+          .format(n=args.values, total=best, per_value=best / args.values * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Cost of adding keys to the tables of big documents through the model API:
+a table of 10k entries and a document of 1k tables (keys added to the middle one).
+
+    python -m benchmarks.statement_nodes [--entries 10000] [--tables 1000] [--adds 1000] [--repeat 5]
+"""
+import argparse
+import timeit
+
+from pip_save.toml.assemble import parse_toml
+
+
+def make_big_table_document(n_entries: int) -> str:
+    lines = ['name = "big-table"', '[deps]']
+    for i in range(n_entries):
+        lines.append('package{i} = "=={i}.0"'.format(i=i))
+
+    lines.append('[dev_deps]')
+    lines.append('pytest = "==3.0"')
+    return '\n'.join(lines) + '\n'
+
+
+def make_many_tables_document(n_tables: int) -> str:
+    lines = ['name = "many-tables"']
+    for i in range(n_tables):
+        lines.append('[table{i}]'.format(i=i))
+        lines.append('key = {i}'.format(i=i))
+
+    return '\n'.join(lines) + '\n'
+
+
+def _time_adds(text: str, table_name: str, n_adds: int, repeat: int) -> float:
+    def add_keys(root):
+        table = root[table_name]
+        for i in range(n_adds):
+            table['added{i}'.format(i=i)] = i
+
+    roots = [parse_toml(text) for _ in range(repeat)]
+    return min(timeit.timeit(lambda: add_keys(root), number=1) for root in roots) / n_adds
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--entries', type=int, default=10000)
+    arg_parser.add_argument('--tables', type=int, default=1000)
+    arg_parser.add_argument('--adds', type=int, default=1000)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    per_add = _time_adds(make_big_table_document(args.entries), 'deps', args.adds, args.repeat)
+    print('table of {n} entries: {per_add:.2f} us per added key'.format(n=args.entries, per_add=per_add * 1e6))
+
+    per_add = _time_adds(make_many_tables_document(args.tables), 'table{}'.format(args.tables // 2),
+                         args.adds, args.repeat)
+    print('document of {n} tables: {per_add:.2f} us per added key'.format(n=args.tables, per_add=per_add * 1e6))
+
+
+if __name__ == '__main__':
+    main()
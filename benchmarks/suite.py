@@ -0,0 +1,128 @@
+"""
+Benchmark suite over a synthetic pypm.toml (see benchmarks.corpus): parsing, writing, loading a project
+and adding dependencies to it. Results are printed as JSON, ops/sec and peak memory of every case.
+With --baseline, results are compared to a stored run, and the command fails on regressions.
+
+    python -m benchmarks.suite [--deps 1000] [--tables 100] [--string-size 4096] [--depth 8] [--repeat 5]
+                               [--output results.json] [--baseline baseline.json] [--threshold 0.1]
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+from benchmarks.corpus import make_pypm_document
+from pip_save.metadata.dependencies import VersionedDependency
+from pip_save.metadata.project import Project
+from pip_save.toml.assemble import parse_toml
+from pip_save.toml.writer import to_toml
+
+# dependencies added by a single run of the add_dependency case
+N_ADDED_DEPS = 100
+
+
+def make_cases(text: str):
+    # name -> (setup, operation), setup is called before each run and its result is passed to the operation
+    def add_dependencies(project):
+        for i in range(N_ADDED_DEPS):
+            project.add_dependency(VersionedDependency('added{i}'.format(i=i), '=={i}.0'.format(i=i)))
+
+    def change_and_write(root):
+        root['deps']['package0'] = '==0.1'
+        return to_toml(root)
+
+    return [
+        ('parse_toml', lambda: text, parse_toml),
+        ('parse_toml bytes', lambda: text.encode(), parse_toml),
+        ('to_toml unchanged', lambda: parse_toml(text), to_toml),
+        ('to_toml changed', lambda: parse_toml(text), change_and_write),
+        # parsed from a file object, the document has no original text and every statement is formatted
+        ('to_toml formatted', lambda: parse_toml(io.StringIO(text)), to_toml),
+        ('Project.from_toml', lambda: text, Project.from_toml),
+        ('add_dependency x{n}'.format(n=N_ADDED_DEPS), lambda: Project.from_toml(text), add_dependencies),
+    ]
+
+
+def _peak_memory(setup, operation) -> int:
+    argument = setup()
+    gc.collect()
+    tracemalloc.start()
+    operation(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run_case(setup, operation, repeat: int) -> dict:
+    best = float('inf')
+    for _ in range(repeat):
+        argument = setup()
+        best = min(best, timeit.timeit(lambda: operation(argument), number=1))
+
+    return {'ops_per_sec': 1 / best, 'peak_memory': _peak_memory(setup, operation)}
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float):
+    # cases slower or using more memory than the baseline by more than the threshold (a fraction)
+    for name, result in sorted(results['cases'].items()):
+        if name not in baseline['cases']:
+            continue
+
+        base_result = baseline['cases'][name]
+        if result['ops_per_sec'] < base_result['ops_per_sec'] * (1 - threshold):
+            yield '{name}: {ops:.1f} ops/sec, {base:.1f} in the baseline'.format(
+                name=name, ops=result['ops_per_sec'], base=base_result['ops_per_sec'])
+
+        if result['peak_memory'] > base_result['peak_memory'] * (1 + threshold):
+            yield '{name}: {memory} bytes at peak, {base} in the baseline'.format(
+                name=name, memory=result['peak_memory'], base=base_result['peak_memory'])
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--deps', type=int, default=1000)
+    arg_parser.add_argument('--tables', type=int, default=100)
+    arg_parser.add_argument('--string-size', type=int, default=4096)
+    arg_parser.add_argument('--depth', type=int, default=8)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--output', help='file to store the results in, for the later --baseline runs')
+    arg_parser.add_argument('--baseline', help='results of a previous run to compare with')
+    arg_parser.add_argument('--threshold', type=float, default=0.1)
+    args = arg_parser.parse_args()
+
+    text = make_pypm_document(args.deps, args.tables, args.string_size, args.depth)
+    results = {'params': {'deps': args.deps, 'tables': args.tables, 'string_size': args.string_size,
+                          'depth': args.depth, 'size': len(text)},
+               'cases': {}}
+    # Project prints the dependencies it loads
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for name, setup, operation in make_cases(text):
+            results['cases'][name] = run_case(setup, operation, args.repeat)
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        if baseline['params'] != results['params']:
+            print('Baseline is measured on another document: {params}'.format(params=baseline['params']),
+                  file=sys.stderr)
+
+        regressions = list(find_regressions(results, baseline, args.threshold))
+        for regression in regressions:
+            print('REGRESSION ' + regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,18 @@
 import os
 from contextlib import contextmanager
-from typing import List
+from typing import List, Union
 
 from pip_save.metadata.dependencies import Dependency, VersionedDependency
 from pip_save.toml.assemble import parse_toml
+from pip_save.toml.cache import parse_toml_cached
 from pip_save.toml.model import Root
 from pip_save.toml.model import Table
 from pip_save.toml.source import InvalidTomlError
-from pip_save.toml.writer import to_toml
+from pip_save.toml.writer import to_toml, to_toml_patch, apply_toml_patch, TomlEdit
+
+
+# the rest of the tables is kept unparsed and written back as is
+PROJECT_TABLES = {'deps', 'dev_deps'}
 
 
 class Project(object):
@@ -31,14 +36,45 @@ class Project(object):
         if isinstance(dep, VersionedDependency):
             self._deps_table[dep.pkg_name] = dep.matcher.specifiers
 
+    def add_dependencies(self, deps: List[Dependency]) -> None:
+        # all the packages of a single install command update the document at once
+        with self._root.batch():
+            for dep in deps:
+                self.add_dependency(dep)
+
     @classmethod
     def from_toml(cls, text: str) -> 'Project':
-        root = parse_toml(text)
+        root = parse_toml(text, tables=PROJECT_TABLES)
+        return cls(root=root)
+
+    @classmethod
+    def from_toml_file(cls, fpath: str) -> 'Project':
+        root = parse_toml_cached(fpath, tables=PROJECT_TABLES)
         return cls(root=root)
 
     def to_toml(self):
         return to_toml(self._root)
 
+    def to_toml_patch(self) -> List[TomlEdit]:
+        return to_toml_patch(self._root)
+
+    @property
+    def original_text(self) -> Union[str, bytes, None]:
+        return self._root.original_text
+
+
+def _patch_file(fpath: str, original_text: Union[str, bytes], edits: List[TomlEdit]) -> None:
+    # the file is rewritten from the first edit on, the text before it stays on disk as is
+    patched_text = apply_toml_patch(original_text, edits)
+    start = edits[0][0]
+    if isinstance(original_text, str):
+        start = len(original_text[:start].encode('utf-8'))
+        patched_text = patched_text.encode('utf-8')
+
+    with open(fpath, 'r+b') as f:
+        f.seek(start)
+        f.write(patched_text[start:])
+        f.truncate()
 
 
 @contextmanager
@@ -48,13 +84,12 @@ def build_project_state(fpath):
                               .format(fpath=fpath,
                                       init="packager init"))
 
-    with open(fpath, 'r') as f:
-        text = f.read()
-
-    project = Project.from_toml(text)
+    project = Project.from_toml_file(fpath)
 
     yield project
-    out = project.to_toml()
+    edits = project.to_toml_patch()
+    if not edits:
+        # nothing has changed, the file isn't touched
+        return
 
-    with open(fpath, 'w') as f:
-        f.write(out)
+    _patch_file(fpath, project.original_text, edits)
@@ -1,7 +1,11 @@
+import os
+import tempfile
 from unittest import TestCase
+from unittest import mock
 
 from pip_save.metadata.dependencies import VersionedDependency
-from pip_save.metadata.project import Project
+from pip_save.metadata.project import Project, build_project_state
+from pip_save.toml.cache import NO_CACHE_ENV_VAR
 from pip_save.toml.model import Root
 
 
@@ -16,3 +20,46 @@ class TestDependencyManagement(TestCase):
         self.assertTrue('django' in root.nodes['deps'])
         self.assertTrue(('deps', 'django') in root.statement_nodes)
 
+    def test_add_dependencies(self):
+        root = Root()
+        project = Project(root)
+        deps = [VersionedDependency('django', '==1.10.2'), VersionedDependency('flask', '==0.11')]
+        project.add_dependencies(deps)
+
+        self.assertEqual(project.deps, deps)
+        self.assertEqual(root.statement_nodes.keys(), [('deps',), ('deps', 'django'), ('deps', 'flask'),
+                                                       ('dev_deps',)])
+
+
+class TestBuildProjectState(TestCase):
+    TEXT = '# project\n[deps]\ndjango = "==1.10.2"\n\n[dev_deps]\n'
+
+    def setUp(self):
+        env_patcher = mock.patch.dict(os.environ, {NO_CACHE_ENV_VAR: '1'})
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+        fd, self.fpath = tempfile.mkstemp(suffix='.toml')
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.TEXT)
+
+    def tearDown(self):
+        os.remove(self.fpath)
+
+    def read(self):
+        with open(self.fpath) as f:
+            return f.read()
+
+    def test_unchanged_file_is_not_written(self):
+        mtime = os.stat(self.fpath).st_mtime_ns
+        os.utime(self.fpath, ns=(mtime - 10 ** 9, mtime - 10 ** 9))
+        with build_project_state(self.fpath):
+            pass
+
+        self.assertEqual(os.stat(self.fpath).st_mtime_ns, mtime - 10 ** 9)
+        self.assertEqual(self.read(), self.TEXT)
+
+    def test_changes_are_patched_in(self):
+        with build_project_state(self.fpath) as project:
+            project.add_dependencies([VersionedDependency('flask', '==0.11')])
+
+        self.assertEqual(self.read(), self.TEXT.replace('"==1.10.2"\n', '"==1.10.2"\nflask = "==0.11"\n'))
@@ -0,0 +1,3 @@
+from pip_save.toml.compare import diff
+# enables the profiling, if it's requested by the environment variable
+from pip_save.toml import profiling
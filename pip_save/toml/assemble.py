@@ -1,37 +1,119 @@
+import mmap
+import os
 from collections import namedtuple
-from typing import Any, Union
+from sys import intern
+from typing import IO, Iterator, Union
 from typing import List
+from typing import Optional, Set
 from typing import Tuple
 
-from pip_save.toml.model import Root, NotSupported, Table
+from pip_save.toml.model import Root, NotSupported, Table, UnparsedTable
 from pip_save.toml.model import TomlStatementNodes
-from pip_save.toml.parser import parse_statement, KVEntry, Comment, ParsedTable
-from pip_save.toml.regex import ENCLOSING_WHITESPACE_CHARS
-from pip_save.toml.source import Source
+from pip_save.toml.parser import parse_statement, KVEntry, Comment, ParsedTable, StatementType, SkippedTable, \
+    skip_table_body
+from pip_save.toml.regex import ENCLOSING_WHITESPACE_CHARS, LINE_END_REGEX
+from pip_save.toml.source import Source, InvalidTomlError, BytesSource
 
+# files are read by chunks of this size (in characters)
+CHUNK_SIZE = 64 * 1024
 
-def parse_statements(text: str) -> List[Any]:
-    source = Source(text)
-    statements = []
-    while len(source._text) > 0:
-        source.consume_regex(ENCLOSING_WHITESPACE_CHARS)
-        # source.consume_regex(TILL_NEW_LINE_REGEX)
-        # is_consumed = source.consume('\n')
-        # if is_consumed:
-        #     statements.append(NewLine())
 
-        statement = parse_statement(source)
+def _parse_statement(source: Source, tables: Optional[Set[str]],
+                     is_complete_text: bool = True) -> Tuple[StatementType, int]:
+    # statement and its end offset
+    start = source.pos
+    statement = parse_statement(source)
+    if tables is None or not isinstance(statement, ParsedTable) or statement.name[0] in tables:
+        return statement, source.pos
+
+    end = skip_table_body(source, is_complete_text)
+    text = source.slice(start, end).rstrip()
+    return SkippedTable(statement.name, text.replace('\r\n', '\n')), end
+
+
+StatementSpan = Tuple[StatementType, Optional[int], Optional[int]]
+
+
+def _iter_statement_spans(source: Source, tables: Optional[Set[str]]) -> Iterator[StatementSpan]:
+    # statements with their (start, end) offsets in the source
+    while source.next_char(ENCLOSING_WHITESPACE_CHARS):
         # source.consume_regex(TILL_NEW_LINE_REGEX)
-        # #
         # is_consumed = source.consume('\n')
         # if is_consumed:
         #     statements.append(NewLine())
-        source.consume_regex(ENCLOSING_WHITESPACE_CHARS)
 
-        statements.append(statement)
+        start = source.pos
+        statement, end = _parse_statement(source, tables)
+        yield statement, start, end
 
     source.expect_eof()
-    return statements
+
+
+def _iter_source_statements(source: Source, tables: Optional[Set[str]]) -> Iterator[StatementType]:
+    for statement, _, _ in _iter_statement_spans(source, tables):
+        yield statement
+
+
+def _iter_file_statements(fp: IO[str], chunk_size: int, tables: Optional[Set[str]]) -> Iterator[StatementType]:
+    buffer = ''
+    read_size = chunk_size
+    # line of the document, the buffer starts at
+    first_line = 1
+    while True:
+        chunk = fp.read(read_size)
+        is_eof = not chunk
+        buffer += chunk
+
+        source = Source(buffer, first_line=first_line)
+        consumed = 0
+        while source.next_char(ENCLOSING_WHITESPACE_CHARS):
+            try:
+                statement, _ = _parse_statement(source, tables, is_complete_text=is_eof)
+            except InvalidTomlError:
+                if is_eof:
+                    raise
+                break
+
+            if not is_eof:
+                if isinstance(statement, SkippedTable):
+                    # skipped body is complete, when it ends with the next table header
+                    is_complete = not source.seek_eof()
+                else:
+                    # statement is complete only if the rest of the line is in the buffer and empty,
+                    # otherwise it could be a prefix of a longer statement from the next chunk
+                    is_complete = source.seek_regex(LINE_END_REGEX)
+
+                if not is_complete:
+                    break
+
+            consumed = source.pos
+            yield statement
+
+        if is_eof:
+            return
+
+        if consumed == 0:
+            # statement is longer than the whole buffer, read more at once to stay linear
+            read_size *= 2
+        else:
+            read_size = chunk_size
+
+        first_line += buffer.count('\n', 0, consumed)
+        buffer = buffer[consumed:]
+
+
+def iter_statements(text_or_file: Union[str, IO[str]], chunk_size: int = CHUNK_SIZE,
+                    tables: Optional[Set[str]] = None) -> Iterator[StatementType]:
+    # tables: names of the top-level tables to parse, bodies of the other tables are yielded
+    # as SkippedTable with their original text. None parses everything.
+    if isinstance(text_or_file, str):
+        return _iter_source_statements(Source(text_or_file), tables)
+
+    return _iter_file_statements(text_or_file, chunk_size, tables)
+
+
+def parse_statements(text: str) -> List[StatementType]:
+    return list(iter_statements(text))
 
 
 UnmergedTable = namedtuple('UnmergedTable', ['name', 'content'])
@@ -49,8 +131,8 @@ def merge_tables(tables: List[UnmergedTable]) -> Root:
         internal_table = root
         for part in name[:-1]:
             if part not in internal_table:
-                internal_table[part] = Table(parent=internal_table,
-                                             parent_table_ref_key=part)
+                # implicit table, it has no statement and isn't a change of the document
+                internal_table._set_node(part, Table(parent=internal_table, parent_table_ref_key=part))
 
             internal_table = internal_table[part]
 
@@ -61,13 +143,45 @@ def merge_tables(tables: List[UnmergedTable]) -> Root:
     return root
 
 
-def parse_toml(text: Union[str, bytes]) -> Root:
+def parse_toml(text: Union[str, bytes, IO[str]], tables: Optional[Set[str]] = None) -> Root:
     if isinstance(text, bytes):
-        text = text.decode()
+        return _assemble(_iter_statement_spans(BytesSource(text), tables), text)
+
+    if isinstance(text, str):
+        return _assemble(_iter_statement_spans(Source(text), tables), text)
+
+    # statements of the file object are not kept, only the values
+    return _assemble(((statement, None, None) for statement in iter_statements(text, tables=tables)))
+
+
+def _parse_buffer(buffer, original_text: Optional[bytes], tables: Optional[Set[str]]) -> Root:
+    try:
+        return _assemble(_iter_statement_spans(BytesSource(buffer), tables), original_text)
+    except InvalidTomlError as e:
+        # position and text of the error are read, while the buffer is there, the error doesn't keep it
+        e.detach_source()
+        raise
 
-    text = text.replace('\r\n', '\n')
-    statements = parse_statements(text)
 
+def parse_toml_file(fpath: str, tables: Optional[Set[str]] = None, keep_original_text: bool = True) -> Root:
+    # The file is parsed as bytes, without decoding it as a whole. The text of unchanged statements is
+    # written back from the original text, so by default the file is read once and the root keeps
+    # the bytes. Without keep_original_text the file is memory-mapped and nothing of it is kept,
+    # every statement is formatted on writing.
+    with open(fpath, 'rb') as f:
+        if keep_original_text:
+            content = f.read()
+            return _parse_buffer(content, content, tables)
+
+        if os.fstat(f.fileno()).st_size == 0:
+            # empty files can't be mapped
+            return _parse_buffer(b'', None, tables)
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return _parse_buffer(mapped, None, tables)
+
+
+def _assemble(statement_spans: Iterator[StatementSpan], original_text: Union[str, bytes, None] = None) -> Root:
     tables = [UnmergedTable((), Root())]  # type: List[UnmergedTable]
     current_table = tables[0].content
 
@@ -77,20 +191,22 @@ def parse_toml(text: Union[str, bytes]) -> Root:
     comment_counter = 1  # type: int
     newline_counter = 1  # type: int
 
-    for statement in statements:
+    for statement, start, end in statement_spans:
+        span = (start, end) if original_text is not None else None
+
         if isinstance(statement, KVEntry):
             absolute_key_name = current_table_name + (statement.key,)
             if absolute_key_name in statement_nodes:
                 raise NotSupported('Key overwrite is not permitted.')
-            statement_nodes[absolute_key_name] = statement.val
+            statement_nodes.append(absolute_key_name, statement.val, span)
 
             current_table.nodes[statement.key] = statement.val
 
         if isinstance(statement, Comment):
-            comment_name = '#' + str(comment_counter)
+            comment_name = intern('#' + str(comment_counter))
             comment_counter += 1
             absolute_comment_name = current_table_name + (comment_name,)
-            statement_nodes[absolute_comment_name] = statement.text
+            statement_nodes.append(absolute_comment_name, statement.text, span)
 
             current_table.nodes[comment_name] = statement.text
         #
@@ -105,14 +221,20 @@ def parse_toml(text: Union[str, bytes]) -> Root:
         if isinstance(statement, ParsedTable):
             if statement.name in statement_nodes:
                 raise NotSupported('Table overwrite is not permitted.')
-            statement_nodes[statement.name] = Table()
-
+            # the statement node is the table itself, not a copy
             new_table = Table()
+            statement_nodes.append(statement.name, new_table, span)
             tables.append(UnmergedTable(statement.name, new_table))
             current_table = new_table
 
             current_table_name = statement.name
 
+        if isinstance(statement, SkippedTable):
+            if statement.name in statement_nodes:
+                raise NotSupported('Table overwrite is not permitted.')
+            statement_nodes.append(statement.name, UnparsedTable(statement.text), span)
+
     root = merge_tables(tables)
     root.set_statement_nodes(statement_nodes)
+    root.original_text = original_text
     return root
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import pickle
+from typing import Optional, Set
+
+from pip_save.toml.assemble import parse_toml, parse_toml_file
+from pip_save.toml.model import Root
+
+# set to any non-empty value to always parse the file
+NO_CACHE_ENV_VAR = 'PIP_SAVE_NO_CACHE'
+CACHE_DIR_ENV_VAR = 'PIP_SAVE_CACHE_DIR'
+
+# least recently used entries are removed, when the cache gets bigger than this (in bytes)
+MAX_CACHE_SIZE = 32 * 1024 * 1024
+
+# bump on every change of the pickled classes, entries of other versions are ignored
+CACHE_FORMAT_VERSION = 9
+
+_ENTRY_SUFFIX = '.pickle'
+
+
+def default_cache_dir() -> str:
+    if os.environ.get(CACHE_DIR_ENV_VAR):
+        return os.environ[CACHE_DIR_ENV_VAR]
+
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'pip-save')
+
+
+def is_cache_enabled() -> bool:
+    return not os.environ.get(NO_CACHE_ENV_VAR)
+
+
+def _entry_path(cache_dir: str, fpath: str, tables: Optional[Set[str]]) -> str:
+    key = os.path.abspath(fpath)
+    if tables is not None:
+        key += '\0' + ','.join(sorted(tables))
+
+    return os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest() + _ENTRY_SUFFIX)
+
+
+def _read_entry(entry_path: str) -> Optional[dict]:
+    try:
+        with open(entry_path, 'rb') as f:
+            entry = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # corrupted or written by another version of the classes
+        return None
+
+    if not isinstance(entry, dict) or entry.get('version') != CACHE_FORMAT_VERSION:
+        return None
+
+    return entry
+
+
+def _write_entry(cache_dir: str, entry_path: str, entry: dict) -> None:
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # write to the temporary file first, concurrent runs never see a partial entry
+        tmp_path = '{path}.{pid}.tmp'.format(path=entry_path, pid=os.getpid())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry_path)
+    except OSError:
+        # cache is an optimization only, read-only or full disk shouldn't break the command
+        return
+
+    evict_entries(cache_dir)
+
+
+def _touch(entry_path: str) -> None:
+    # modification time of the entry is its last use, for the LRU eviction
+    try:
+        os.utime(entry_path)
+    except OSError:
+        pass
+
+
+def evict_entries(cache_dir: str, max_size: int = MAX_CACHE_SIZE) -> None:
+    entries = []
+    total_size = 0
+    try:
+        for fname in os.listdir(cache_dir):
+            if not fname.endswith(_ENTRY_SUFFIX):
+                continue
+
+            path = os.path.join(cache_dir, fname)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total_size += stat.st_size
+    except OSError:
+        return
+
+    entries.sort()
+    for _, size, path in entries:
+        if total_size <= max_size:
+            return
+
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+
+        total_size -= size
+
+
+def parse_toml_cached(fpath: str, tables: Optional[Set[str]] = None,
+                      cache_dir: Optional[str] = None) -> Root:
+    # Root is reused from the previous parse of the same file, if (mtime, size) of the file
+    # haven't changed or, failing that, its content hash is the same.
+    if not is_cache_enabled():
+        return parse_toml_file(fpath, tables=tables)
+
+    cache_dir = cache_dir or default_cache_dir()
+    entry_path = _entry_path(cache_dir, fpath, tables)
+    entry = _read_entry(entry_path)
+
+    stat = os.stat(fpath)
+    if entry is not None and (entry['mtime'], entry['size']) == (stat.st_mtime_ns, stat.st_size):
+        _touch(entry_path)
+        return entry['root']
+
+    with open(fpath, 'rb') as f:
+        content = f.read()
+    content_hash = hashlib.sha1(content).hexdigest()
+
+    if entry is not None and entry['hash'] == content_hash:
+        root = entry['root']
+    else:
+        root = parse_toml(content, tables=tables)
+
+    _write_entry(cache_dir, entry_path, {
+        'version': CACHE_FORMAT_VERSION,
+        'mtime': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'hash': content_hash,
+        'root': root
+    })
+    return root
@@ -0,0 +1,94 @@
+from collections import namedtuple
+from typing import Any, Iterator, Optional
+
+from pip_save.toml.model import Root, ChangeEventType, Table, NodeName, TomlStatementNodes, UnparsedTable
+
+# type is Add, Remove or SetValue, old_value is None for the added nodes, new_value for the removed ones
+NodeDiff = namedtuple('NodeDiff', ['type', 'node_name', 'old_value', 'new_value'])
+
+# types of the keyword values (InlineTable is a dict), checked instead of isinstance(value, Table),
+# which is slow on the ABCMeta classes
+_VALUE_TYPES = (str, int, float, list, dict)
+
+
+def _table_or_none(statement_nodes: TomlStatementNodes, table_name: NodeName) -> Any:
+    if table_name not in statement_nodes:
+        return None
+
+    value = statement_nodes[table_name]
+    return value if isinstance(value, Table) else None
+
+
+def _iter_table_diffs(statement_nodes: TomlStatementNodes, other_statement_nodes: Optional[TomlStatementNodes],
+                      table_name: NodeName, node_type: ChangeEventType) -> Iterator[NodeDiff]:
+    # keywords of the table body in the document order, which are missing in (or for Remove, differ from)
+    # other_statement_nodes. Nested tables are compared on their own.
+    for node_name, value in statement_nodes.table_items(table_name):
+        if not isinstance(value, _VALUE_TYPES) or node_name[-1].startswith('#'):
+            continue
+
+        other_value = None
+        if other_statement_nodes is not None and node_name in other_statement_nodes:
+            other_value = other_statement_nodes[node_name]
+
+        if not isinstance(other_value, _VALUE_TYPES):
+            if node_type == ChangeEventType.Add:
+                yield NodeDiff(node_type, node_name, None, value)
+            else:
+                yield NodeDiff(node_type, node_name, value, None)
+
+        elif node_type == ChangeEventType.Remove and other_value != value:
+            yield NodeDiff(ChangeEventType.SetValue, node_name, value, other_value)
+
+
+def _has_same_values(table_a: Table, table_b: Table) -> bool:
+    # Different hashes are enough to tell the tables apart. With the same ones, the keywords of the tables
+    # are compared (the hashes don't see the values changed in place), nested tables are compared on
+    # their own. False only means, that the statements are compared one by one.
+    if table_a.content_hashes()[0] != table_b.content_hashes()[0]:
+        return False
+
+    nodes_a, nodes_b = table_a.nodes, table_b.nodes
+    if nodes_a.keys() != nodes_b.keys():
+        return False
+
+    for key, value in nodes_a.items():
+        if isinstance(value, _VALUE_TYPES) and value != nodes_b[key]:
+            return False
+
+    return True
+
+
+def diff(root_a: Root, root_b: Root) -> Iterator[NodeDiff]:
+    # Statements added, removed or changed in root_b compared to root_a, comments are ignored. Tables are
+    # merged in the order of root_a, the tables only root_b has follow. Tables with different content
+    # hashes are compared statement by statement, the rest only if their nodes differ.
+    nodes_a = root_a.statement_nodes
+    nodes_b = root_b.statement_nodes
+
+    for table_name in nodes_a.table_names():
+        if not table_name:
+            table_a, table_b = root_a, root_b
+        else:
+            table_a, table_b = nodes_a[table_name], _table_or_none(nodes_b, table_name)
+
+        if table_b is None:
+            yield NodeDiff(ChangeEventType.Remove, table_name, table_a, None)
+            yield from _iter_table_diffs(nodes_a, None, table_name, ChangeEventType.Remove)
+            continue
+
+        if table_name and _has_same_values(table_a, table_b):
+            continue
+
+        if isinstance(table_a, UnparsedTable) or isinstance(table_b, UnparsedTable):
+            # unparsed tables have no statements of their own
+            yield NodeDiff(ChangeEventType.SetValue, table_name, table_a, table_b)
+
+        yield from _iter_table_diffs(nodes_a, nodes_b, table_name, ChangeEventType.Remove)
+        yield from _iter_table_diffs(nodes_b, nodes_a, table_name, ChangeEventType.Add)
+
+    for table_name in nodes_b.table_names():
+        if table_name and _table_or_none(nodes_a, table_name) is None:
+            table_b = nodes_b[table_name]
+            yield NodeDiff(ChangeEventType.Add, table_name, None, table_b)
+            yield from _iter_table_diffs(nodes_b, None, table_name, ChangeEventType.Add)
@@ -1,9 +1,19 @@
+import hashlib
 from abc import abstractmethod, ABCMeta
 from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from types import MappingProxyType
 from enum import Enum
+from functools import lru_cache
 from typing import Any
 from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Set
 from typing import Tuple
+from typing import Union
+from weakref import WeakSet
 
 from pip_save.toml.parser import ValueType, _parse_table_name
 from pip_save.toml.source import Source
@@ -31,6 +41,9 @@ ChangeEvent = namedtuple('ChangeEvent', [
 
 
 class Node(metaclass=ABCMeta):
+    # slotted, a big document holds lots of nodes
+    __slots__ = ('parent', 'parent_table_ref_key')
+
     def __init__(self, parent=None, parent_table_ref_key=None):
         self.parent = parent  # type: Node
         self.parent_table_ref_key = parent_table_ref_key  # type: str
@@ -42,10 +55,92 @@ class Node(metaclass=ABCMeta):
         raise NotImplementedError()
 
 
+# content hashes are sums of the hashes of the entries, so that an entry is updated in O(1)
+_CONTENT_HASH_MODULUS = 2 ** 128
+
+
+def _hash_text(text: str) -> int:
+    # stable across processes, unlike hash()
+    return int.from_bytes(hashlib.sha1(text.encode('utf-8')).digest()[:16], 'big')
+
+
+def _table_entry_hash(key: str, content_hashes: Tuple[int, int]) -> int:
+    return _hash_text('{key!r} = table {hashes[0]:x} {hashes[1]:x}'.format(key=key, hashes=content_hashes))
+
+
+def _entry_hash(key: str, value) -> int:
+    # 0 for the missing entries
+    if value is None:
+        return 0
+
+    if isinstance(value, Table):
+        return _table_entry_hash(key, value.content_hashes())
+
+    return _hash_text('{key!r} = {value!r}'.format(key=key, value=value))
+
+
 class Table(Node):
+    __slots__ = ('nodes', '_content_hashes')
+
     def __init__(self, nodes=None, parent=None, parent_table_ref_key=None):
         super().__init__(parent, parent_table_ref_key)
         self.nodes = nodes or {}
+        # (hash of the values, hash of the comments), computed on the first request and
+        # kept up to date by the changes after it. Values changed in place are not seen.
+        self._content_hashes = None  # type: Optional[Tuple[int, int]]
+
+    def _compute_content_hashes(self) -> Tuple[int, int]:
+        values_hash = comments_hash = 0
+        for key, value in self.nodes.items():
+            if key.startswith('#'):
+                comments_hash += _entry_hash(key, value)
+            else:
+                values_hash += _entry_hash(key, value)
+
+        return values_hash % _CONTENT_HASH_MODULUS, comments_hash % _CONTENT_HASH_MODULUS
+
+    def content_hashes(self) -> Tuple[int, int]:
+        if self._content_hashes is None:
+            self._content_hashes = self._compute_content_hashes()
+
+        return self._content_hashes
+
+    def digest(self) -> str:
+        # hash of the content of the table without the comments, nested tables included
+        return '{:032x}'.format(self.content_hashes()[0])
+
+    def _update_content_hashes(self, key: str, old_entry_hash: int, new_entry_hash: int) -> None:
+        # the change of the entry goes up to the root, only through the tables with the computed hashes
+        old_hashes = self._content_hashes
+        if old_hashes is None:
+            return
+
+        values_hash, comments_hash = old_hashes
+        if key.startswith('#'):
+            comments_hash = (comments_hash - old_entry_hash + new_entry_hash) % _CONTENT_HASH_MODULUS
+        else:
+            values_hash = (values_hash - old_entry_hash + new_entry_hash) % _CONTENT_HASH_MODULUS
+        self._content_hashes = (values_hash, comments_hash)
+
+        parent = self.parent
+        if isinstance(parent, Table) and self.parent_table_ref_key is not None:
+            ref_key = self.parent_table_ref_key
+            parent._update_content_hashes(ref_key, _table_entry_hash(ref_key, old_hashes),
+                                          _table_entry_hash(ref_key, self._content_hashes))
+
+    def _set_node(self, key: str, value) -> None:
+        # value None removes the node
+        old_entry_hash = new_entry_hash = 0
+        if self._content_hashes is not None:
+            old_entry_hash = _entry_hash(key, self.nodes.get(key))
+            new_entry_hash = _entry_hash(key, value)
+
+        self._keep_node(key)
+        if value is None:
+            del self.nodes[key]
+        else:
+            self.nodes[key] = value
+        self._update_content_hashes(key, old_entry_hash, new_entry_hash)
 
     def process_change_event(self, event: ChangeEvent):
         if self.parent is None or self.parent_table_ref_key is None:
@@ -55,6 +150,15 @@ class Table(Node):
         processed_event = ChangeEvent(event.type, (self.parent_table_ref_key,) + event.node_name, event.value)
         self.parent.process_change_event(processed_event)
 
+    def _keep_node(self, key: str) -> None:
+        # the snapshots of the root get the old value of the node before its change (see Root.snapshot)
+        root = self
+        while root.parent is not None:
+            root = root.parent
+
+        if isinstance(root, Root):
+            root.keep_node(self, key)
+
     def __setitem__(self, key, value):
         # check whether table exists in the AST (and not just added in process of table.nested.subnested creation)
         if isinstance(value, Table):
@@ -68,7 +172,7 @@ class Table(Node):
         node_name = (key,)
         event = ChangeEvent(event_type, node_name, value)
 
-        self.nodes[key] = value
+        self._set_node(key, value)
         self.process_change_event(event)
         # if self.parent is None:
         #     raise UnboundTable()
@@ -78,7 +182,7 @@ class Table(Node):
         node_name = (key,)
         event = ChangeEvent(event_type, node_name, None)
 
-        del self.nodes[key]
+        self._set_node(key, None)
         self.process_change_event(event)
 
     def __getitem__(self, item):
@@ -88,6 +192,10 @@ class Table(Node):
         return item in self.nodes
 
     def __eq__(self, other):
+        if not isinstance(other, Table):
+            return NotImplemented
+
+        # not by the content hashes, they don't see the values changed in place
         return self.nodes == other.nodes
 
     def __str__(self):
@@ -100,105 +208,610 @@ class Table(Node):
         return self.nodes.items()
 
 
+class UnparsedTable(Table):
+    # table left unparsed by parse_toml(text, tables=...), its text is written back as is
+    __slots__ = ('text',)
+
+    def __init__(self, text: str) -> None:
+        super().__init__()
+        self.text = text
+
+    def _compute_content_hashes(self) -> Tuple[int, int]:
+        return _hash_text(self.text), 0
+
+    def __eq__(self, other):
+        if not isinstance(other, Table):
+            return NotImplemented
+
+        return isinstance(other, UnparsedTable) and self.text == other.text
+
+    def __str__(self):
+        return 'UnparsedTable({text!r})'.format(text=self.text)
+
+
 NodeName = Tuple[str, ...]
+Span = Tuple[int, int]
+
+
+class _StatementLink(object):
+    __slots__ = ('name', 'value', 'table_name', 'span', 'is_changed', 'prev', 'next')
+
+    def __init__(self, name: NodeName = None, value=None, table_name: NodeName = ()) -> None:
+        self.name = name
+        self.value = value
+        # (start, end) of the statement in the original text, None if it's new
+        self.span = None  # type: Optional[Span]
+        self.is_changed = False
+        # name of the table the statement belongs to (its own name for table headers)
+        self.table_name = table_name
+        self.prev = self  # type: _StatementLink
+        self.next = self  # type: _StatementLink
 
 
 class TomlStatementNodes(object):
+    # Statements in the document order: a doubly linked list with the index from node name to its link,
+    # so that lookups, insertions and removals don't depend on the size of the document.
+    __slots__ = ('_head', '_links', '_table_bounds', '_removed_spans', '_snapshots')
+
     def __init__(self, nodes_dict=None):
-        self._statements = nodes_dict or OrderedDict()  # type: Dict[NodeName, Any]
+        # sentinel of the circular list, _head.next is the first statement, _head.prev is the last one.
+        # It stands for the header of the root table as well.
+        self._head = _StatementLink()
+        self._links = {}  # type: Dict[NodeName, _StatementLink]
+        # first and last statements of every table: the header and the last statement of its body
+        self._table_bounds = {(): [self._head, self._head]}  # type: Dict[NodeName, List[_StatementLink]]
+        # original spans of the statements removed from their places
+        self._removed_spans = []  # type: List[Span]
+        self._snapshots = None  # type: Optional[WeakSet]
+        for node_name, value in (nodes_dict or {}).items():
+            self[node_name] = value
+
+    def _iter_links(self) -> Iterator[_StatementLink]:
+        link = self._head.next
+        while link is not self._head:
+            yield link
+            link = link.next
+
+    def _set_table_name(self, first_link: _StatementLink, table_name: NodeName) -> _StatementLink:
+        # move the body, which starts at first_link, to the table, return the last link of the body
+        last_link = first_link.prev
+        link = first_link
+        while link is not self._head and not isinstance(link.value, Table):
+            if self._snapshots:
+                self._keep((link,))
+            link.table_name = table_name
+            last_link = link
+            link = link.next
+
+        return last_link
+
+    def _link_after(self, prev_link: _StatementLink, node_name: NodeName, value) -> None:
+        old_link = self._links.get(node_name)
+        if old_link is not None:
+            if old_link is prev_link:
+                # the node is moved to its own place, the anchor is the link before it
+                prev_link = old_link.prev
+            self._unlink(node_name)
+
+        if self._snapshots:
+            self._keep((prev_link, prev_link.next), (node_name,),
+                       (prev_link.table_name, node_name) if isinstance(value, Table) else (prev_link.table_name,))
+
+        link = _StatementLink(node_name, value, prev_link.table_name)
+        link.prev = prev_link
+        link.next = prev_link.next
+        prev_link.next.prev = link
+        prev_link.next = link
+        self._links[node_name] = link
+
+        bounds = self._table_bounds[prev_link.table_name]
+        if isinstance(value, Table):
+            # new table takes the rest of the body of the table it's inserted into
+            link.table_name = node_name
+            if bounds[1] is not prev_link:
+                self._table_bounds[node_name] = [link, bounds[1]]
+                self._set_table_name(link.next, node_name)
+            else:
+                self._table_bounds[node_name] = [link, link]
+            bounds[1] = prev_link
+
+        elif bounds[1] is prev_link:
+            bounds[1] = link
+
+    def _unlink(self, node_name: NodeName) -> None:
+        if self._snapshots:
+            link = self._links[node_name]
+            self._keep((link, link.prev, link.next), (node_name,), (link.table_name, link.prev.table_name))
+
+        link = self._links.pop(node_name)
+        if link.span is not None:
+            self._removed_spans.append(link.span)
+        link.prev.next = link.next
+        link.next.prev = link.prev
+
+        bounds = self._table_bounds[link.table_name]
+        if link.table_name == node_name:
+            # removed table header, its body joins the previous table
+            del self._table_bounds[node_name]
+            prev_bounds = self._table_bounds[link.prev.table_name]
+            if bounds[1] is not link:
+                prev_bounds[1] = self._set_table_name(link.next, link.prev.table_name)
+
+        elif bounds[1] is link:
+            bounds[1] = link.prev
 
     def add_root_keyword(self, key: str, value) -> None:
-        first_table_name = None
-        for node_name, val in self._statements.items():
-            if isinstance(val, Table):
-                first_table_name = node_name
+        # root keywords go before the first table
+        self._link_after(self._table_bounds[()][1], (key,), value)
 
-        if first_table_name is None:
-            self._statements[(key,)] = value
+    def add_table_keyword(self, table_name: NodeName, key: str, value) -> None:
+        if table_name not in self._table_bounds:
+            raise KeyError('No such table {}.'.format(table_name))
+
+        self._link_after(self._table_bounds[table_name][1], table_name + (key,), value)
+
+    def insert_after(self, node_name: NodeName, new_node_name: NodeName, new_value) -> None:
+        self._link_after(self._links[node_name], new_node_name, new_value)
+
+    def insert_before(self, node_name: NodeName, new_node_name: NodeName, new_value) -> None:
+        self._link_after(self._links[node_name].prev, new_node_name, new_value)
+
+    def append(self, node_name: NodeName, value, span: Optional[Span] = None) -> None:
+        self._link_after(self._head.prev, node_name, value)
+        self._links[node_name].span = span
+
+    def __setitem__(self, key: NodeName, value):
+        link = self._links.get(key)
+        if link is not None and isinstance(link.value, Table) == isinstance(value, Table):
+            if self._snapshots:
+                self._keep((link,))
+            link.value = value
+            link.is_changed = True
             return
 
-        self.insert_before(first_table_name, (key,), value)
+        self._link_after(self._head.prev, key, value)
 
-    def add_table_keyword(self, table_name: NodeName, key: str, value) -> None:
-        if table_name not in self._statements:
-            raise KeyError('No such table {}.'.format(table_name))
+    def __getitem__(self, item):
+        return self._links[item].value
 
-        previous_node_name = None
-        inside_the_table = False
-        for node_name, val in self._statements.items():
-            # implement slices over OrderedDict?
-            if isinstance(val, Table):
-                if node_name == table_name:
-                    inside_the_table = True
-                else:
-                    if inside_the_table:
-                        break
+    def __delitem__(self, key):
+        self._unlink(key)
 
-            if inside_the_table:
-                previous_node_name = node_name
+    def __contains__(self, item: NodeName) -> bool:
+        return item in self._links
 
-        self.insert_after(previous_node_name, table_name + (key,), value)
+    def __len__(self) -> int:
+        return len(self._links)
 
-    def insert_after(self, node_name: NodeName, new_node_name: NodeName, new_value) -> None:
-        new_statements = OrderedDict()  # type: Dict[NodeName, Any]
-        for key, val in self._statements.items():
-            new_statements[key] = val
-            if key == node_name:
-                new_statements[new_node_name] = new_value
+    def __iter__(self) -> Iterator[NodeName]:
+        for link in self._iter_links():
+            yield link.name
 
-        self._statements = new_statements
+    def keys(self):
+        return list(self)
 
-    def insert_before(self, node_name: NodeName, new_node_name: NodeName, new_value) -> None:
-        new_statements = OrderedDict()  # type: Dict[NodeName, Any]
-        for key, val in self._statements.items():
-            if key == node_name:
-                new_statements[new_node_name] = new_value
+    def items(self):
+        return [(link.name, link.value) for link in self._iter_links()]
+
+    def items_with_spans(self) -> Iterator[Tuple[NodeName, Any, Optional[Span]]]:
+        # span is None for the new and changed statements
+        for link in self._iter_links():
+            yield link.name, link.value, link.span if not link.is_changed else None
+
+    def items_with_original_spans(self) -> Iterator[Tuple[NodeName, Any, Optional[Span], bool]]:
+        for link in self._iter_links():
+            yield link.name, link.value, link.span, link.is_changed
+
+    def table_names(self) -> Iterator[NodeName]:
+        # names of the tables in the document order, () for the root, O(1) per table
+        link = self._head
+        while True:
+            table_name = link.table_name
+            yield table_name
+            link = self._table_bounds[table_name][1].next
+            if link is self._head:
+                return
 
-            new_statements[key] = val
-        self._statements = new_statements
+    def table_items(self, table_name: NodeName) -> Iterator[Tuple[NodeName, Any]]:
+        # statements of the table body in the document order, without the header
+        header_link, last_link = self._table_bounds[table_name]
+        link = header_link
+        while link is not last_link:
+            link = link.next
+            yield link.name, link.value
+
+    def removed_spans(self) -> List[Span]:
+        return list(self._removed_spans)
+
+    def snapshot(self) -> 'TomlStatementNodesSnapshot':
+        # O(1), the changes after it give the snapshot the old state of what they change
+        snapshot = TomlStatementNodesSnapshot(self)
+        if self._snapshots is None:
+            self._snapshots = WeakSet()
+        self._snapshots.add(snapshot)
+        return snapshot
+
+    def _keep(self, links: Tuple[_StatementLink, ...], node_names: Tuple[NodeName, ...] = (),
+              table_names: Tuple[NodeName, ...] = ()) -> None:
+        # called before the change of the links, of the index entries and of the bounds of the tables
+        for snapshot in list(self._snapshots):
+            snapshot.keep(links, node_names, table_names)
+
+    def __getstate__(self):
+        # links are pickled as a flat list, a chain of them would exceed the recursion limit
+        return list(self.items_with_original_spans()), self._removed_spans
+
+    def __setstate__(self, state):
+        self.__init__()
+        items, removed_spans = state
+        for node_name, value, span, is_changed in items:
+            self.append(node_name, value, span)
+            self._links[node_name].is_changed = is_changed
+        self._removed_spans = removed_spans
 
-        self._statements = new_statements
+    def __str__(self):
+        return str(self.items())
 
-    def __setitem__(self, key: NodeName, value):
-        self._statements[key] = value
+    def __repr__(self):
+        return str(self)
+
+
+# marks the nodes, which are missing in the snapshot
+_MISSING = object()
+
+
+class TomlStatementNodesSnapshot(object):
+    # Statement nodes as they were at the time of TomlStatementNodes.snapshot(). The links are shared with
+    # the live statement nodes: before the first change of a link, of an index entry or of the bounds of
+    # a table after the snapshot, its old state is kept here. Live fields are read first, the kept state
+    # replaces them, so the readers don't see the changes even while they're made.
+    __slots__ = ('_statement_nodes', '_kept_links', '_kept_index', '_kept_bounds', '_len', '_removed_count',
+                 '__weakref__')
+
+    def __init__(self, statement_nodes: TomlStatementNodes) -> None:
+        self._statement_nodes = statement_nodes
+        # link -> (value, is_changed, table_name, prev, next)
+        self._kept_links = {}  # type: Dict[_StatementLink, Tuple[Any, bool, NodeName, _StatementLink, _StatementLink]]
+        # node name -> its link, None if it's missing
+        self._kept_index = {}  # type: Dict[NodeName, Optional[_StatementLink]]
+        # table name -> (header link, last link), None if it's missing
+        self._kept_bounds = {}  # type: Dict[NodeName, Optional[Tuple[_StatementLink, _StatementLink]]]
+        self._len = len(statement_nodes)
+        # removed spans are only appended
+        self._removed_count = len(statement_nodes._removed_spans)
+
+    def keep(self, links: Tuple[_StatementLink, ...], node_names: Tuple[NodeName, ...],
+             table_names: Tuple[NodeName, ...]) -> None:
+        for link in links:
+            if link not in self._kept_links:
+                self._kept_links[link] = (link.value, link.is_changed, link.table_name, link.prev, link.next)
+
+        for node_name in node_names:
+            if node_name not in self._kept_index:
+                self._kept_index[node_name] = self._statement_nodes._links.get(node_name)
+
+        for table_name in table_names:
+            if table_name not in self._kept_bounds:
+                bounds = self._statement_nodes._table_bounds.get(table_name)
+                self._kept_bounds[table_name] = tuple(bounds) if bounds is not None else None
+
+    def _link_state(self, link: _StatementLink) -> Tuple[Any, bool, NodeName, _StatementLink, _StatementLink]:
+        state = (link.value, link.is_changed, link.table_name, link.prev, link.next)
+        return self._kept_links.get(link, state)
+
+    def _link(self, node_name: NodeName) -> Optional[_StatementLink]:
+        link = self._statement_nodes._links.get(node_name)
+        return self._kept_index.get(node_name, link)
+
+    def _last_link(self, table_name: NodeName) -> _StatementLink:
+        bounds = self._statement_nodes._table_bounds.get(table_name)
+        last_link = bounds[1] if bounds is not None else None
+        kept_bounds = self._kept_bounds.get(table_name, _MISSING)
+        if kept_bounds is not _MISSING:
+            return kept_bounds[1]
+
+        return last_link
+
+    def _iter_links(self) -> Iterator[Tuple[_StatementLink, Tuple]]:
+        head = self._statement_nodes._head
+        link = self._link_state(head)[4]
+        while link is not head:
+            state = self._link_state(link)
+            yield link, state
+            link = state[4]
 
     def __getitem__(self, item):
-        return self._statements[item]
+        link = self._link(item)
+        if link is None:
+            raise KeyError(item)
 
-    def __delitem__(self, key):
-        del self._statements[key]
+        return self._link_state(link)[0]
 
     def __contains__(self, item: NodeName) -> bool:
-        return item in self._statements
+        return self._link(item) is not None
 
     def __len__(self) -> int:
-        return len(list(self._statements.keys()))
+        return self._len
+
+    def __iter__(self) -> Iterator[NodeName]:
+        for link, _ in self._iter_links():
+            yield link.name
 
     def keys(self):
-        return list(self._statements.keys())
+        return list(self)
 
     def items(self):
-        return list(self._statements.items())
+        return [(link.name, state[0]) for link, state in self._iter_links()]
+
+    def items_with_spans(self) -> Iterator[Tuple[NodeName, Any, Optional[Span]]]:
+        for link, state in self._iter_links():
+            yield link.name, state[0], link.span if not state[1] else None
+
+    def items_with_original_spans(self) -> Iterator[Tuple[NodeName, Any, Optional[Span], bool]]:
+        for link, state in self._iter_links():
+            yield link.name, state[0], link.span, state[1]
+
+    def table_names(self) -> Iterator[NodeName]:
+        head = self._statement_nodes._head
+        link = head
+        while True:
+            table_name = self._link_state(link)[2]
+            yield table_name
+            link = self._link_state(self._last_link(table_name))[4]
+            if link is head:
+                return
+
+    def removed_spans(self) -> List[Span]:
+        return self._statement_nodes._removed_spans[:self._removed_count]
 
     def __str__(self):
-        return str(list(self._statements.items()))
+        return str(self.items())
 
     def __repr__(self):
         return str(self)
 
 
+def _merge_change_events(first: ChangeEvent, second: ChangeEvent) -> Optional[ChangeEvent]:
+    # single event with the same effect as both of them, None if they cancel each other out
+    if second.type == ChangeEventType.Remove:
+        if first.type == ChangeEventType.Add:
+            return None
+        return second
+
+    if first.type == ChangeEventType.Add:
+        return ChangeEvent(ChangeEventType.Add, first.node_name, second.value)
+
+    # value is changed or removed and added back, the statement keeps its place
+    return ChangeEvent(ChangeEventType.SetValue, first.node_name, second.value)
+
+
+@lru_cache(maxsize=1024)
+def _parse_node_name(name: str) -> NodeName:
+    # dotted name as in the table headers, 'a."b.c"' is ('a', 'b.c')
+    s = Source(name)
+    node_name = _parse_table_name(s)
+    if not s.seek_eof():
+        raise ValueError('Invalid table name {}'.format(name))
+
+    return node_name
+
+
+class TableSnapshot(object):
+    # read-only view of a table, as it was when the snapshot was taken
+    __slots__ = ('_snapshot', '_table')
+
+    def __init__(self, snapshot: 'RootSnapshot', table: Table) -> None:
+        self._snapshot = snapshot
+        self._table = table
+
+    @property
+    def nodes(self) -> MappingProxyType:
+        return MappingProxyType(self._snapshot.nodes_of(self._table))
+
+    def __getitem__(self, item):
+        value = self._snapshot.node_of(self._table, item)
+        if value is _MISSING:
+            raise KeyError(item)
+
+        return self._snapshot.view(value)
+
+    def __contains__(self, item):
+        return self._snapshot.node_of(self._table, item) is not _MISSING
+
+    def __str__(self):
+        return 'TableSnapshot({dict})'.format(dict=str(dict(self.nodes)))
+
+    def __repr__(self):
+        return str(self)
+
+    def items(self):
+        return [(key, self._snapshot.view(val)) for key, val in self.nodes.items()]
+
+
+class RootSnapshot(TableSnapshot):
+    # Root as it was at the time of Root.snapshot(). Nothing is copied, neither to take it nor by
+    # the writes after it: the root gives the snapshot the old value of a node before its first change,
+    # the statement nodes do the same for their links (see TomlStatementNodesSnapshot). A write costs O(1)
+    # per live snapshot. Snapshots can be read from any thread, the writes are never seen.
+    __slots__ = ('statement_nodes', 'original_text', 'formatted_statements', '_kept_nodes', '_dirty_nodes',
+                 '_new_dirty_nodes', '__weakref__')
+
+    def __init__(self, root: 'Root') -> None:
+        # not a reference to itself (see _snapshot), a dropped snapshot is freed at once and
+        # the writes stop keeping the old nodes for it
+        self._table = root
+        self.statement_nodes = root.statement_nodes.snapshot()
+        self.original_text = root.original_text
+        # statements never change, the snapshot has its own cache of their text
+        self.formatted_statements = {}  # type: Dict[NodeName, Tuple[Any, str]]
+        # id of the table -> (table, old values of its nodes changed after the snapshot, _MISSING for
+        # the added ones)
+        self._kept_nodes = {}  # type: Dict[int, Tuple[Table, dict]]
+        # dirty nodes of the root are only added, the ones added after the snapshot are kept apart
+        self._dirty_nodes = root.dirty_nodes
+        self._new_dirty_nodes = set()  # type: Set[NodeName]
+
+    @property
+    def _snapshot(self) -> 'RootSnapshot':
+        return self
+
+    @property
+    def dirty_nodes(self) -> Set[NodeName]:
+        dirty_nodes = set(self._dirty_nodes)
+        dirty_nodes.difference_update(self._new_dirty_nodes)
+        return dirty_nodes
+
+    def keep_node(self, table: Table, key: str) -> None:
+        # the table keeps the reference, so that its id isn't reused
+        kept_nodes = self._kept_nodes.get(id(table))
+        if kept_nodes is None:
+            kept_nodes = self._kept_nodes[id(table)] = (table, {})
+
+        if key not in kept_nodes[1]:
+            kept_nodes[1][key] = table.nodes.get(key, _MISSING)
+
+    def keep_clean_node(self, node_name: NodeName) -> None:
+        self._new_dirty_nodes.add(node_name)
+
+    def node_of(self, table: Table, key: str):
+        # the live node is read before the kept one, the root changes it only after it's kept
+        value = table.nodes.get(key, _MISSING)
+        kept_nodes = self._kept_nodes.get(id(table))
+        if kept_nodes is not None:
+            return kept_nodes[1].get(key, value)
+
+        return value
+
+    def nodes_of(self, table: Table) -> dict:
+        nodes = dict(table.nodes)
+        kept_nodes = self._kept_nodes.get(id(table))
+        if kept_nodes is not None:
+            for key, value in list(kept_nodes[1].items()):
+                if value is _MISSING:
+                    nodes.pop(key, None)
+                else:
+                    nodes[key] = value
+
+        return nodes
+
+    def view(self, value):
+        if isinstance(value, Table):
+            return TableSnapshot(self, value)
+
+        return value
+
+    def get_path(self, path: Union[NodeName, str]):
+        node_name = _parse_node_name(path) if isinstance(path, str) else path
+        if not node_name:
+            return self
+
+        if node_name in self.statement_nodes:
+            return self.view(self.statement_nodes[node_name])
+
+        parent = self.get_path(node_name[:-1])
+        if not isinstance(parent, (TableSnapshot, dict)) or node_name[-1] not in parent:
+            raise KeyError(path)
+
+        return parent[node_name[-1]]
+
+    def __str__(self):
+        return 'RootSnapshot({dict})'.format(dict=str(dict(self.nodes)))
+
+
 class Root(Table):
+    __slots__ = ('statement_nodes', 'original_text', 'dirty_nodes', 'formatted_statements', '_pending_events',
+                 '_snapshots')
+
     def __init__(self, nodes=None, statement_nodes=None):
         super().__init__(nodes)
         self.statement_nodes = statement_nodes or TomlStatementNodes()
+        # text the document is parsed from, unchanged statements are copied from it by the writer
+        self.original_text = None  # type: Union[str, bytes, None]
+        # names of the statement nodes added, changed or removed since parsing
+        self.dirty_nodes = set()  # type: Set[NodeName]
+        # node name -> (value, its text) of the statements formatted by the writer,
+        # entries are dropped by the change events of the nodes
+        self.formatted_statements = {}  # type: Dict[NodeName, Tuple[Any, str]]
+        # events queued by batch(), by node name in the order of their first change
+        self._pending_events = None  # type: Optional[Dict[NodeName, ChangeEvent]]
+        self._snapshots = None  # type: Optional[WeakSet]
+
+    def snapshot(self) -> RootSnapshot:
+        # O(1), nothing is copied by the writes after it either (see RootSnapshot).
+        # Taken by the writing thread, between the changes.
+        if self._pending_events is not None:
+            raise NotSupported('Snapshot of the root can\'t be taken inside of a batch.')
+
+        snapshot = RootSnapshot(self)
+        if self._snapshots is None:
+            self._snapshots = WeakSet()
+        self._snapshots.add(snapshot)
+        return snapshot
+
+    def keep_node(self, table: Table, key: str) -> None:
+        if not self._snapshots:
+            return
+
+        for snapshot in list(self._snapshots):
+            snapshot.keep_node(table, key)
+
+    def _mark_dirty(self, node_name: NodeName) -> None:
+        if self._snapshots and node_name not in self.dirty_nodes:
+            for snapshot in list(self._snapshots):
+                snapshot.keep_clean_node(node_name)
+
+        self.dirty_nodes.add(node_name)
+
+    def __getstate__(self):
+        # snapshots aren't pickled
+        return {'nodes': self.nodes,
+                'statement_nodes': self.statement_nodes,
+                'original_text': self.original_text,
+                'dirty_nodes': self.dirty_nodes}
+
+    def __setstate__(self, state):
+        self.__init__()
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @contextmanager
+    def batch(self):
+        # Changes to the statement nodes are applied at once, when the block exits.
+        # Events of the same node are merged, so it is updated at most once.
+        if self._pending_events is not None:
+            # nested batch is a part of the outer one
+            yield self
+            return
+
+        self._pending_events = OrderedDict()
+        try:
+            yield self
+        finally:
+            pending_events, self._pending_events = self._pending_events, None
+            for event in pending_events.values():
+                self._apply_change_event(event)
 
     def process_change_event(self, event: ChangeEvent) -> None:
-        if event.value is None:
-            # removals
-            if len(event.node_name) == 1:
-                del self.statement_nodes[event.node_name]
+        if self._pending_events is None:
+            self._apply_change_event(event)
+            return
+
+        queued_event = self._pending_events.get(event.node_name)
+        if queued_event is not None:
+            event = _merge_change_events(queued_event, event)
+            if event is None:
+                del self._pending_events[queued_event.node_name]
                 return
 
+        self._pending_events[event.node_name] = event
+
+    def _apply_change_event(self, event: ChangeEvent) -> None:
+        self._mark_dirty(event.node_name)
+        self.formatted_statements.pop(event.node_name, None)
+        if event.type == ChangeEventType.Remove:
+            del self.statement_nodes[event.node_name]
+            return
+
         if isinstance(event.value, ValueType.__union_params__):
             if event.type == ChangeEventType.SetValue:
                 self.statement_nodes[event.node_name] = event.value
@@ -220,36 +833,71 @@ class Root(Table):
 
         if isinstance(event.value, Table):
             if event.type == ChangeEventType.Add:
-                self.statement_nodes[event.node_name] = Table()
+                self.statement_nodes[event.node_name] = event.value
                 return
 
+    def get_path(self, path: Union[NodeName, str]):
+        # value of the node by its name, ('a', 'b', 'c') or 'a.b.c'. Statements are found by the index
+        # of statement_nodes, only the nodes inside of inline tables and the implicitly created tables
+        # are looked up in their parents.
+        node_name = _parse_node_name(path) if isinstance(path, str) else path
+        if not node_name:
+            return self
+
+        if self._pending_events is not None:
+            # statement nodes are behind the tree until the batch is applied
+            return self._walk_path(node_name)
+
+        if node_name in self.statement_nodes:
+            return self.statement_nodes[node_name]
+
+        parent = self.get_path(node_name[:-1])
+        if not isinstance(parent, (Table, dict)) or node_name[-1] not in parent:
+            raise KeyError(path)
+
+        return parent[node_name[-1]]
+
+    def _walk_path(self, node_name: NodeName):
+        value = self
+        for part in node_name:
+            if not isinstance(value, (Table, dict)) or part not in value:
+                raise KeyError(node_name)
+            value = value[part]
+
+        return value
+
+    def _get_or_create_table(self, node_name: NodeName) -> Table:
+        if not node_name:
+            return self
+
+        try:
+            return self.get_path(node_name)
+        except KeyError:
+            pass
+
+        parent = self._get_or_create_table(node_name[:-1])
+        # can't use Table[item] = Table(), there is no statement for the table
+        table = Table(parent=parent, parent_table_ref_key=node_name[-1])
+        parent._set_node(node_name[-1], table)
+        return table
+
     def __setitem__(self, key, value):
         if not isinstance(value, Table):
             super().__setitem__(key, value)
             return
 
-        s = Source(key)
-        node_name = _parse_table_name(s)
-        if len(s._text) > 0:
-            raise ValueError('Invalid table name {}'.format(key))
-
+        node_name = _parse_node_name(key)
         if node_name in self.statement_nodes:
             raise NotSupported('Table override is not supported.')
 
-        current_table = self
-        for part in node_name[:-1]:
-            if part not in current_table:
-                # can't use Table[item] = Table(), use .nodes
-                current_table.nodes[part] = Table(parent=current_table,
-                                                  parent_table_ref_key=part)
-
-            current_table = current_table[part]
-
-        current_table.nodes[node_name[-1]] = value
+        current_table = self._get_or_create_table(node_name[:-1])
         value.parent = current_table
         value.parent_table_ref_key = node_name[-1]
+        current_table._set_node(node_name[-1], value)
 
-        self.statement_nodes[node_name] = Table()
+        # the statement node is the table itself, as in the parsed documents
+        self.statement_nodes[node_name] = value
+        self._mark_dirty(node_name)
 
     def set_statement_nodes(self, nodes: TomlStatementNodes) -> None:
         self.statement_nodes = nodes
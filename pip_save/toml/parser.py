@@ -1,12 +1,17 @@
-import re
 from collections import OrderedDict
 from collections import namedtuple
-from typing import Pattern, Union, List, Tuple
+from sys import intern
+from typing import Match, Union, List, Tuple
 
-from pip_save.toml.regex import MULTILINE_BASIC_STRING_REGEX, BASIC_STRING, NUMBER_REGEX, LITERAL_STRING, \
-    NEWLINE_ESCAPE_CHARS_REGEX, SHORT_UNICODE_REGEX, LONG_UNICODE_REGEX, ESCAPE_CHARS_REGEX, ESCAPES_MAPPING, \
-    LITERAL_MULTILINE_STRING, ENCLOSING_WHITESPACE_CHARS, KEYWORD_REGEX, WHITESPACE_REGEX, COMMENT_REGEX
-from pip_save.toml.source import Source, InvalidTomlError, ExpectationError
+from pip_save.toml.regex import ESCAPES_MAPPING, ESCAPE_SEQUENCE_REGEX, BARE_KEY_CHARS, NUMBER_CHARS, \
+    BASIC_STRING_TOKEN_REGEX, ML_BASIC_STRING_TOKEN_REGEX, LITERAL_STRING_TOKEN_REGEX, \
+    ML_LITERAL_STRING_TOKEN_REGEX, STRING_INVALID_CHARS_REGEX, ML_STRING_INVALID_CHARS_REGEX, \
+    LITERAL_STRING_INVALID_CHARS_REGEX, ML_LITERAL_STRING_INVALID_CHARS_REGEX, BOOLEAN_TOKEN_REGEX, \
+    NUMBER_TOKEN_REGEX, BARE_KEY_TOKEN_REGEX, \
+    COMMENT_TOKEN_REGEX, EQUALS_TOKEN_REGEX, TABLE_NAME_SEPARATOR_TOKEN_REGEX, TABLE_END_TOKEN_REGEX, \
+    ARRAY_SEPARATOR_TOKEN_REGEX, INLINE_TABLE_SEPARATOR_TOKEN_REGEX, WHITESPACE_REGEX, ENCLOSING_WHITESPACE_CHARS, \
+    TABLE_BODY_TOKEN_REGEX
+from pip_save.toml.source import Source, InvalidTomlError
 
 
 class DoesNotMatch(InvalidTomlError):
@@ -20,90 +25,98 @@ class InlineTable(OrderedDict):
 ValueType = Union[float, int, str, bool, list, InlineTable]
 
 
-def _parse_regex(s: Source, regex: Pattern) -> str:
-    match = s.consume_regex(regex)
-    if not match:
-        raise DoesNotMatch('Cannot match {text}... to regex {regex}'.format(
-            text=s._text[:100],
-            regex=regex
-        ))
+def _dispatch_table(*entries):
+    # first character -> the only parser, which can accept text starting with it
+    table = {}
+    for chars, parser in entries:
+        for char in chars:
+            table[char] = parser
 
-    return s.last_consumed
+    return table
 
 
-def _parse_string(source: Source, string_regex=BASIC_STRING, separator='"') -> str:
-    source.expect(separator)
-    res = []
-    while True:
-        if not source.consume_regex(string_regex):
-            raise DoesNotMatch('Invalid string starting from {text}'
-                               .format(text=source._text[:100]))
-        res.append(source.last_consumed)
+def _unescape(match: Match) -> str:
+    kind = match.lastgroup
+    if kind == 'newline':
+        # line ending backslash removes newline and all the whitespace after it
+        return ''
+
+    if kind == 'char':
+        return ESCAPES_MAPPING[match.group(kind)]
+
+    # read unicode characters
+    return chr(int(match.group(kind), 16))
+
+
+def _parse_string(text: str) -> str:
+    # escape sequences are already validated by the token regex
+    if '\\' not in text:
+        return text
+
+    return ESCAPE_SEQUENCE_REGEX.sub(_unescape, text)
 
-        # start of some escape character
-        if not source.consume('\\'):
-            break
-        # do nothing if new line chars encountered
-        # corresponds to \
-        if source.consume_regex(NEWLINE_ESCAPE_CHARS_REGEX):
-            pass
 
-        # read unicode characters
-        elif source.consume_regex(SHORT_UNICODE_REGEX) or source.consume_regex(LONG_UNICODE_REGEX):
-            res.append(chr(int(source.last_consumed, 16)))
+def _normalize_newlines(text: str) -> str:
+    # CRLF is allowed inside of multiline strings, values always use LF
+    if '\r' not in text:
+        return text
 
-        else:
-            # fail if no escape character follows
-            source.expect_regex(ESCAPE_CHARS_REGEX)
-            res.append(ESCAPES_MAPPING[source.last_consumed])
+    return text.replace('\r\n', '\n')
 
-    source.expect(separator)
-    return ''.join(res)
+
+def _parse_single_line_basic_string(source: Source) -> str:
+    text = source.consume_quoted('"', STRING_INVALID_CHARS_REGEX)
+    if text is not None:
+        return text
+
+    return _parse_string(source.expect_match(BASIC_STRING_TOKEN_REGEX).group()[1:-1])
 
 
 def _parse_basic_string(source: Source) -> str:
-    return _parse_string(source, string_regex=BASIC_STRING,
-                         separator='"')
+    if not source.seek('"""'):
+        return _parse_single_line_basic_string(source)
 
+    text = source.consume_quoted('"""', ML_STRING_INVALID_CHARS_REGEX)
+    if text is not None:
+        return text
 
-def _parse_multiline_string(source: Source) -> str:
-    return _parse_string(source, string_regex=MULTILINE_BASIC_STRING_REGEX,
-                         separator='"""')
+    return _parse_string(_normalize_newlines(source.expect_match(ML_BASIC_STRING_TOKEN_REGEX).group()[3:-3]))
 
 
-def _parse_number(parsed_str: str) -> Union[int, float]:
-    parsed_str = parsed_str.replace('_', '')
-    if '.' in parsed_str or 'e' in parsed_str or 'E' in parsed_str:
-        return float(parsed_str)
-    else:
-        return int(parsed_str, 10)
+def _parse_single_line_literal_string(source: Source) -> str:
+    text = source.consume_quoted('\'', LITERAL_STRING_INVALID_CHARS_REGEX)
+    if text is not None:
+        return text
 
+    # fails with the error message
+    return source.expect_match(LITERAL_STRING_TOKEN_REGEX).group()[1:-1]
 
-def _parse_literal_string(source: Source, string_regex=LITERAL_STRING, separator='\'') -> str:
-    source.expect(separator)
 
-    is_matched = source.consume_regex(string_regex)
-    if not is_matched:
-        raise DoesNotMatch()
+def _parse_literal_string(source: Source) -> str:
+    if not source.seek("'''"):
+        return _parse_single_line_literal_string(source)
 
-    parsed_str = source.last_consumed
-    source.expect(separator)
+    text = source.consume_quoted("'''", ML_LITERAL_STRING_INVALID_CHARS_REGEX)
+    if text is not None:
+        return text
 
-    return parsed_str
+    return _normalize_newlines(source.expect_match(ML_LITERAL_STRING_TOKEN_REGEX).group()[3:-3])
 
 
-def _parse_basic_literal_string(source: Source) -> str:
-    return _parse_literal_string(source, string_regex=LITERAL_STRING,
-                                 separator='\'')
+def _parse_number(parsed_str: str) -> Union[int, float]:
+    parsed_str = parsed_str.replace('_', '')
+    if '.' in parsed_str or 'e' in parsed_str or 'E' in parsed_str:
+        return float(parsed_str)
+    else:
+        return int(parsed_str, 10)
 
 
-def _parse_multiline_literal_string(source: Source) -> str:
-    return _parse_literal_string(source, string_regex=LITERAL_MULTILINE_STRING,
-                                 separator='\'\'\'')
+def _parse_number_value(source: Source) -> Union[int, float]:
+    return _parse_number(source.expect_match(NUMBER_TOKEN_REGEX).group())
 
 
-# def expect_enclosing_whitespace_chars(source: Source):
-#     source.expect_regex(ENCLOSING_WHITESPACE_CHARS)
+def _parse_boolean(source: Source) -> bool:
+    return source.expect_match(BOOLEAN_TOKEN_REGEX).group() == 'true'
 
 
 class MixedTypesArray(InvalidTomlError):
@@ -115,26 +128,22 @@ def _parse_array(source: Source) -> List[ValueType]:
     items = []  # type: List[ValueType]
     source.expect('[')
 
-    try:
-        while True:
-            source.consume_regex(ENCLOSING_WHITESPACE_CHARS)
-            parsed_val = parse_value(source)
+    # the loop ends on "]" found by the separator token, never by an exception
+    while source.next_char(ENCLOSING_WHITESPACE_CHARS) != ']':
+        value_pos = source.pos
+        parsed_val = parse_value(source)
 
-            if array_type is not None and \
-                    not isinstance(parsed_val, array_type):
-                raise MixedTypesArray
+        if array_type is None:
+            array_type = type(parsed_val)
+        elif not isinstance(parsed_val, array_type):
+            raise MixedTypesArray('Array items must be of the same type, found "{text}" in {array_type} array',
+                                  source, value_pos, array_type=array_type.__name__)
 
-            if array_type is None:
-                array_type = type(parsed_val)
+        items.append(parsed_val)
 
-            items.append(parsed_val)
+        if source.expect_match(ARRAY_SEPARATOR_TOKEN_REGEX).lastgroup == 'array_end':
+            return items
 
-            source.consume_regex(ENCLOSING_WHITESPACE_CHARS)
-            source.expect(',')
-    except (ExpectationError, DoesNotMatch):
-        pass
-
-    source.consume_regex(ENCLOSING_WHITESPACE_CHARS)
     source.expect(']')
     return items
 
@@ -142,131 +151,129 @@ def _parse_array(source: Source) -> List[ValueType]:
 def _parse_inline_table(source: Source) -> InlineTable:
     table = InlineTable()
     source.expect('{')
-    if not source.consume('}'):
-        source.consume_regex(WHITESPACE_REGEX)
-        kv_entry = parse_kv_entry(source)
-
-        if source.last_consumed == '}':
-            raise InvalidTomlError('Cannot have nested inline tables.')
-
-        table[kv_entry.key] = kv_entry.val
-
-        while source.consume(','):
-            source.consume_regex(WHITESPACE_REGEX)
-            kv_entry = parse_kv_entry(source)
-            table[kv_entry.key] = kv_entry.val
-            source.consume_regex(WHITESPACE_REGEX)
 
+    if source.next_char(WHITESPACE_REGEX) == '}':
         source.expect('}')
+        return table
 
-    return table
-
-
-def parse_value(source: Source) -> ValueType:
-    boolean_match = source.consume_regex(re.compile(r'(?P<res>(true)|(false))'))
-    if boolean_match:
-        return source.last_consumed == 'true'
-
-    if source.seek('"""'):
-        return _parse_multiline_string(source)
-
-    if source.seek('"'):
-        return _parse_basic_string(source)
+    while True:
+        entry_pos = source.pos
+        kv_entry = parse_kv_entry(source)
+        if isinstance(kv_entry.val, InlineTable):
+            raise InvalidTomlError('Cannot have nested inline tables: "{text}"', source, entry_pos)
 
-    if source.seek('\'\'\''):
-        return _parse_multiline_literal_string(source)
+        table[kv_entry.key] = kv_entry.val
 
-    if source.seek('\''):
-        return _parse_literal_string(source)
+        if source.expect_match(INLINE_TABLE_SEPARATOR_TOKEN_REGEX).lastgroup == 'inline_table_end':
+            return table
 
-    # datetime_match = source.consume_regex(DATETIME_REGEX)
-    # if datetime_match:
-    #     return _parse_datetime(source.last_consumed)
 
-    number_match = source.consume_regex(NUMBER_REGEX)
-    if number_match:
-        return _parse_number(source.last_consumed)
+_VALUE_PARSERS = _dispatch_table(('"', _parse_basic_string),
+                                 ('\'', _parse_literal_string),
+                                 ('tf', _parse_boolean),
+                                 (NUMBER_CHARS, _parse_number_value),
+                                 ('[', _parse_array),
+                                 ('{', _parse_inline_table))
 
-    if source.seek('['):
-        return _parse_array(source)
 
-    if source.seek('{'):
-        return _parse_inline_table(source)
+def parse_value(source: Source) -> ValueType:
+    parser = _VALUE_PARSERS.get(source.next_char(WHITESPACE_REGEX))
+    if parser is None:
+        raise DoesNotMatch('Cannot find valid TOML value in string "{text}"', source, source.pos)
 
-    raise DoesNotMatch('Cannot find valid TOML value in string {text}'
-                       .format(text=source._text[:100]))
+    return parser(source)
 
 
 KVEntry = namedtuple('KVEntry', ['key', 'val'])
 ParsedTable = namedtuple('ParsedTable', ['name'])
 Comment = namedtuple('Comment', ['text'])
+# table with the header and the body left unparsed, text is the original text of both
+SkippedTable = namedtuple('SkippedTable', ['name', 'text'])
 
 
-def parse_keyword(source: Source) -> str:
-    if source.seek('"'):
-        return _parse_basic_string(source)
+_KEYWORD_PARSERS = _dispatch_table(
+    ('"', _parse_single_line_basic_string),
+    ('\'', _parse_single_line_literal_string),
+    (BARE_KEY_CHARS, lambda source: source.expect_match(BARE_KEY_TOKEN_REGEX).group())
+)
 
-    if source.seek('\''):
-        return _parse_literal_string(source)
 
-    match = source.consume_regex(KEYWORD_REGEX)
-    if not match:
-        raise DoesNotMatch()
+def parse_keyword(source: Source) -> str:
+    parser = _KEYWORD_PARSERS.get(source.next_char(WHITESPACE_REGEX))
+    if parser is None:
+        raise DoesNotMatch('Cannot find valid TOML keyword in string "{text}"', source, source.pos)
 
-    return source.last_consumed
+    # the same keys repeat across tables and documents, all the node names share a single copy
+    return intern(parser(source))
 
 
 def parse_kv_entry(source: Source) -> KVEntry:
     key = parse_keyword(source)
-
-    source.consume_regex(WHITESPACE_REGEX)
-    source.expect('=')
-    source.consume_regex(WHITESPACE_REGEX)
-
+    source.expect_match(EQUALS_TOKEN_REGEX)
     val = parse_value(source)
     return KVEntry(key, val)
 
 
 def _parse_table_name(source: Source) -> Tuple[str, ...]:
-    source.consume_regex(WHITESPACE_REGEX)
     keys = [parse_keyword(source)]
-    source.consume_regex(WHITESPACE_REGEX)
-
-    while source.consume('.'):
-        source.consume_regex(WHITESPACE_REGEX)
-        key = parse_keyword(source)
-        keys.append(key)
-        source.consume_regex(WHITESPACE_REGEX)
+    while source.consume_token(TABLE_NAME_SEPARATOR_TOKEN_REGEX):
+        keys.append(parse_keyword(source))
 
+    source.consume_regex(WHITESPACE_REGEX)
     return tuple(keys)
 
 
 def parse_table(source: Source) -> ParsedTable:
     source.expect('[')
     keys = _parse_table_name(source)
-    source.expect(']')
+    source.expect_token(TABLE_END_TOKEN_REGEX)
 
     return ParsedTable(keys)
 
 
 def parse_line_comment(source: Source) -> Comment:
-    source.expect('#')
-    source.consume_regex(COMMENT_REGEX)
-    text = source.last_consumed
+    match = source.expect_match(COMMENT_TOKEN_REGEX)
+    return Comment(match.group()[1:])
 
-    source.expect_regex(re.compile(r'(?P<res>\n|\Z)'))
-    return Comment(text)
 
+def skip_table_body(source: Source, is_complete_text: bool = True) -> int:
+    # advance to the next table header ("[" at the start of a line, outside of any array) or to EOF,
+    # return the end of the last token of the body. If the text is a part of a bigger one, a string
+    # without its end is incomplete, its body can't be told from the table headers.
+    array_depth = 0
+    end = source.pos
+    while not source.seek_eof():
+        match = source.expect_match(TABLE_BODY_TOKEN_REGEX)
+        kind = match.lastgroup
+        if kind == 'newline':
+            if array_depth == 0 and source.seek('['):
+                return end
+            continue
 
-StatementType = Union[KVEntry, ParsedTable, Comment]
+        if kind == 'array_start':
+            array_depth += 1
 
+        elif kind == 'array_end' and array_depth > 0:
+            array_depth -= 1
 
-def parse_statement(source: Source) -> StatementType:
-    if source.seek('#'):
-        return parse_line_comment(source)
+        elif kind == 'text' and not is_complete_text and match.group(kind) in ('"', "'"):
+            raise DoesNotMatch('String is not terminated "{text}"', source, match.start())
 
-    if source.seek('['):
-        return parse_table(source)
+        end = match.end()
+
+    return end
+
+
+StatementType = Union[KVEntry, ParsedTable, Comment, SkippedTable]
+
+_STATEMENT_PARSERS = _dispatch_table(('#', parse_line_comment),
+                                     ('[', parse_table),
+                                     ('"\'' + BARE_KEY_CHARS, parse_kv_entry))
+
+
+def parse_statement(source: Source) -> StatementType:
+    parser = _STATEMENT_PARSERS.get(source.next_char(ENCLOSING_WHITESPACE_CHARS))
+    if parser is None:
+        raise DoesNotMatch('Cannot find valid TOML statement in string "{text}"', source, source.pos)
 
-    kv_entry = parse_kv_entry(source)
-    return kv_entry
+    return parser(source)
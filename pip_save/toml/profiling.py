@@ -0,0 +1,166 @@
+import atexit
+import os
+import sys
+from collections import Counter
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Tuple
+
+from pip_save.toml import assemble, writer
+from pip_save.toml.model import Root, TomlStatementNodes
+from pip_save.toml.source import Source, BytesSource
+
+# set to any non-empty value to profile the TOML engine and print the summary at exit
+PROFILE_ENV_VAR = 'PIP_SAVE_PROFILE'
+
+# Instrumentation replaces the functions on the hot paths with the counting wrappers on enable() and
+# puts the originals back on disable(), so that disabled profiling costs nothing.
+
+_SOURCE_METHODS = ('consume', 'consume_regex', 'consume_token', 'expect_match', 'seek_regex', 'next_char',
+                   'consume_quoted')
+
+_counters = Counter()  # type: Counter
+# name -> [calls, total seconds]
+_timings = {}  # type: Dict[str, List[Any]]
+# (owner, attribute, original value) of the replaced functions
+_originals = []  # type: List[Tuple[Any, str, Any]]
+_is_summary_registered = False
+
+
+def _add_timing(name: str, seconds: float) -> None:
+    timing = _timings.get(name)
+    if timing is None:
+        timing = _timings[name] = [0, 0.0]
+
+    timing[0] += 1
+    timing[1] += seconds
+
+
+def _count_source_method(method: Callable) -> Callable:
+    calls_name = 'source calls: ' + method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        start = self._pos
+        result = method(self, *args, **kwargs)
+        _counters[calls_name] += 1
+        _counters['{kind} scanned'.format(kind='bytes' if isinstance(self, BytesSource) else 'chars')] += \
+            self._pos - start
+        return result
+
+    return wrapper
+
+
+def _time_parse_statement(parse_statement: Callable) -> Callable:
+    @wraps(parse_statement)
+    def wrapper(source):
+        start = perf_counter()
+        statement = parse_statement(source)
+        _add_timing('parse ' + type(statement).__name__, perf_counter() - start)
+        return statement
+
+    return wrapper
+
+
+def _count_change_events(process_change_event: Callable) -> Callable:
+    @wraps(process_change_event)
+    def wrapper(self, event):
+        _counters['change events: ' + event.type.name] += 1
+        return process_change_event(self, event)
+
+    return wrapper
+
+
+def _count_rebuilds(setstate: Callable) -> Callable:
+    @wraps(setstate)
+    def wrapper(self, state):
+        # unpickled from the cache, snapshots don't copy the statement nodes
+        _counters['statement nodes rebuilds'] += 1
+        return setstate(self, state)
+
+    return wrapper
+
+
+def _time_format_statement(format_statement: Callable) -> Callable:
+    @wraps(format_statement)
+    def wrapper(node_name, val):
+        start = perf_counter()
+        text = format_statement(node_name, val)
+        _add_timing('format ' + type(val).__name__, perf_counter() - start)
+        return text
+
+    return wrapper
+
+
+def _replace(owner: Any, name: str, make_wrapper: Callable) -> None:
+    original = owner.__dict__[name]
+    _originals.append((owner, name, original))
+    setattr(owner, name, make_wrapper(original))
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable(print_summary: bool = True) -> None:
+    global _is_summary_registered
+    if is_enabled():
+        return
+
+    for source_class in (Source, BytesSource):
+        for method_name in _SOURCE_METHODS:
+            if method_name in source_class.__dict__:
+                _replace(source_class, method_name, _count_source_method)
+
+    _replace(assemble, 'parse_statement', _time_parse_statement)
+    _replace(Root, 'process_change_event', _count_change_events)
+    _replace(TomlStatementNodes, '__setstate__', _count_rebuilds)
+    _replace(writer, '_format_statement', _time_format_statement)
+
+    if print_summary and not _is_summary_registered:
+        atexit.register(_print_summary)
+        _is_summary_registered = True
+
+
+def disable() -> None:
+    while _originals:
+        owner, name, original = _originals.pop()
+        setattr(owner, name, original)
+
+
+def reset() -> None:
+    _counters.clear()
+    _timings.clear()
+
+
+def get_counters() -> Dict[str, int]:
+    return dict(_counters)
+
+
+def get_timings() -> Dict[str, Tuple[int, float]]:
+    # name -> (calls, total seconds)
+    return {name: (calls, seconds) for name, (calls, seconds) in _timings.items()}
+
+
+def format_summary() -> str:
+    lines = ['{name:<40} {count:>12}'.format(name='counter', count='count')]
+    for name, count in sorted(_counters.items()):
+        lines.append('{name:<40} {count:>12}'.format(name=name, count=count))
+
+    lines.append('')
+    lines.append('{name:<40} {calls:>12} {total:>12} {per_call:>12}'.format(name='timing', calls='calls',
+                                                                           total='total ms', per_call='per call us'))
+    for name, (calls, seconds) in sorted(_timings.items(), key=lambda item: -item[1][1]):
+        lines.append('{name:<40} {calls:>12} {total:>12.2f} {per_call:>12.2f}'.format(
+            name=name, calls=calls, total=seconds * 1000, per_call=seconds / calls * 1000000))
+
+    return '\n'.join(lines)
+
+
+def _print_summary() -> None:
+    if _counters or _timings:
+        print('pip-save TOML profile\n' + format_summary(), file=sys.stderr)
+
+
+if os.environ.get(PROFILE_ENV_VAR):
+    enable()
@@ -1,4 +1,6 @@
 import re
+import string
+from typing import Dict, Pattern
 
 # internal content of a basic string (within quotes):
 # no ", no control characters (\000 - \037), no \ (in regex has to be escaped, hence two \\)
@@ -6,45 +8,132 @@ import re
 
 BASIC_STRING = re.compile(r'(?P<res>[^"\\\000-\037]*)')
 
+# like python variable name, but can start with number
+_KEYWORD = r'[0-9a-zA-Z\-_]+'
+KEYWORD_REGEX = re.compile(r'(?P<res>' + _KEYWORD + ')')
+
+# number (float or integer)
+# BASE.DECIMALe+-EXP
+_NUMBER = (r'[+-]?'  # sign (? - zero or one)
+           r'(?:0|[1-9](?:_?\d)*)'  # part before the dot
+           r'(?:\.\d(?:_?\d)*)?'  # after the dot
+           r'(?:[eE][+-]?(?:\d(?:_?\d)*))?')  # exponent
+NUMBER_REGEX = re.compile(r'(?P<res>' + _NUMBER + ')')
+
+ESCAPES_MAPPING = {'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', '"': '"', '\'': '\'',
+                   '\\': '\\', '/': '/', 'f': '\f'}
+
+ESCAPE_SEQUENCE_REGEX = re.compile(r'\\(?:(?P<newline>\n[ \t\n]*)'  # line ending backslash
+                                   r'|u(?P<short_unicode>[0-9a-fA-F]{4})'  # \u0001
+                                   r'|U(?P<long_unicode>[0-9a-fA-F]{8})'  # \U00010001
+                                   r'|(?P<char>[bnrt"\'\\/f]))')
+
+# DATETIME_REGEX = re.compile(r'(?P<res>' + rfc3339_regex.pattern + ')')
+
+# CRLF line endings are accepted by the lexer itself, the text is never rewritten
+ENCLOSING_WHITESPACE_CHARS = re.compile(r'(?P<res>([ \t]|\r?\n)*)')
+WHITESPACE_REGEX = re.compile(r'(?P<res>([ \t])*)')
+NEWLINE_REGEX = re.compile(r'\n')
+# rest of the line after a statement
+LINE_END_REGEX = re.compile(r'[ \t]*(?:#[^\r\n]*)?\r?\n')
+# KEYWORD_REGEX = re.compile(r'[0-9a-zA-Z-_]+')
+# ENCLOSING_WHITESPACE_CHARS = re.compile(r'(?P<res>[ \t]|\n)*') # space or tab OR just \n
+
+# Single-pass tokenizer.
+# Every alternative is a named group (and every inner group is non-capturing), so that
+# match.lastgroup names the kind of the token. Where the next token could be of several kinds,
+# its first character selects the only regex to try, so the text is scanned once per token
+# instead of once per failed alternative.
+_ESCAPE = r'\\(?:[bnrt"\'\\/f]|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8})'
+_ML_ESCAPE = r'\\(?:[bnrt"\'\\/f]|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|\r?\n[ \t\r\n]*)'
+
+# String contents are written as "unrolled loops": runs of plain chars, separated by single escapes
+# (or quotes, newlines), which can't start a run. There is only one way to match any text, so
+# the regexes stay linear on long and on unterminated strings.
+BASIC_STRING_TOKEN = ('basic_string', r'"[^"\\\000-\037]*(?:' + _ESCAPE + r'[^"\\\000-\037]*)*"')
 # internal content of multiline string:
 # \n == \012 is allowed
 # at most two consecutive "
-# MY_MULTILINE_BASIC_STRING_REGEX = re.compile(r'"{3}(?P<res>("{0,2}[^"\000-\011\013-\037])*)"{3}')
-MULTILINE_BASIC_STRING_REGEX = re.compile(r'(?P<res>("{0,2}[^"\\\000-\011\013-\037])*)')
-
+ML_BASIC_STRING_TOKEN = ('ml_basic_string',
+                         r'"""[^"\\\000-\011\013-\037]*'
+                         r'(?:(?:\r\n|"(?!"")|' + _ML_ESCAPE + r')[^"\\\000-\011\013-\037]*)*"""')
 # literal strings = raw strings in python. no escaping allowed
-# no ", no control characters (\000 - \037)
-LITERAL_STRING = re.compile(r"(?P<res>[^'\000-\037]*)")
-
+# no ', no control characters (\000 - \037)
+LITERAL_STRING_TOKEN = ('literal_string', r"'[^'\000-\037]*'")
 # internal content of multiline literal string:
 # \n == \012 is allowed
 # at most two consecutive '
-LITERAL_MULTILINE_STRING = re.compile(r"(?P<res>(?:'{0,2}[^'\000-\011\013-\037])*)")
+ML_LITERAL_STRING_TOKEN = ('ml_literal_string',
+                           r"'''[^'\000-\011\013-\037]*(?:(?:\r\n|'(?!''))[^'\000-\011\013-\037]*)*'''")
+# chars, which the strings can't contain to be read without the token regex (see Source.consume_quoted):
+# control chars and the start of escape sequences
+STRING_INVALID_CHARS_REGEX = re.compile(r'[\\\000-\037]')
+LITERAL_STRING_INVALID_CHARS_REGEX = re.compile(r'[\000-\037]')
+# CRLF inside of multiline strings is valid, but is left for the token regex as well
+ML_STRING_INVALID_CHARS_REGEX = re.compile(r'[\\\000-\011\013-\037]')
+ML_LITERAL_STRING_INVALID_CHARS_REGEX = re.compile(r'[\000-\011\013-\037]')
+# chars, which the writer escapes in the basic strings
+ESCAPED_CHARS_REGEX = re.compile(r'[\\"\000-\037]')
+BOOLEAN_TOKEN = ('boolean', r'true|false')
+NUMBER_TOKEN = ('number', _NUMBER)
+BARE_KEY_TOKEN = ('bare_key', _KEYWORD)
+ARRAY_END_TOKEN = ('array_end', r'\]')
+INLINE_TABLE_END_TOKEN = ('inline_table_end', r'\}')
+COMMA_TOKEN = ('comma', r',')
+DOT_TOKEN = ('dot', r'\.')
+COMMENT_TOKEN = ('comment', r'#[^\r\n]*')
+TABLE_END_TOKEN = ('table_end', r'\]')
 
-# like python variable name, but can start with number
-KEYWORD_REGEX = re.compile(r'(?P<res>[0-9a-zA-Z\-_]+)')
 
-# number (float or integer)
-# BASE.DECIMALe+-EXP
-NUMBER_REGEX = re.compile(r'(?P<res>[+-]?'  # sign (? - zero or one)
-                          r'(?:0|[1-9](?:_?\d)*)'  # part before the dot
-                          r'(?:\.\d(?:_?\d)*)?'  # after the dot
-                          r'(?:[eE][+-]?(?:\d(?:_?\d)*))?)')  # exponent
+def _token_regex(*tokens, whitespace=r'[ \t]*'):
+    alternatives = '|'.join('(?P<{kind}>{pattern})'.format(kind=kind, pattern=pattern)
+                            for kind, pattern in tokens)
+    return re.compile(whitespace + '(?:' + alternatives + ')')
 
-NEWLINE_ESCAPE_CHARS_REGEX = re.compile('(?P<res>\n[ \t\n]*)')
 
-SHORT_UNICODE_REGEX = re.compile(r'u(?P<res>([0-9a-fA-F]{4}))')  # \u0001
-LONG_UNICODE_REGEX = re.compile(r'U(?P<res>([0-9a-fA-F]{8}))')  # \U00010001
-ESCAPE_CHARS_REGEX = re.compile(r'(?P<res>[bnrt"\'\\/f])')
+# chars, which the tokens can start with (see the dispatch tables in parser.py)
+BARE_KEY_CHARS = string.ascii_letters + string.digits + '-_'
+NUMBER_CHARS = string.digits + '+-'
 
-ESCAPES_MAPPING = {'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', '"': '"', '\'': '\'',
-                   '\\': '\\', '/': '/', 'f': '\f'}
+# tokens selected by their first character, they start right at the cursor
+BASIC_STRING_TOKEN_REGEX = _token_regex(BASIC_STRING_TOKEN, whitespace='')
+ML_BASIC_STRING_TOKEN_REGEX = _token_regex(ML_BASIC_STRING_TOKEN, whitespace='')
+LITERAL_STRING_TOKEN_REGEX = _token_regex(LITERAL_STRING_TOKEN, whitespace='')
+ML_LITERAL_STRING_TOKEN_REGEX = _token_regex(ML_LITERAL_STRING_TOKEN, whitespace='')
+BOOLEAN_TOKEN_REGEX = _token_regex(BOOLEAN_TOKEN, whitespace='')
+NUMBER_TOKEN_REGEX = _token_regex(NUMBER_TOKEN, whitespace='')
+BARE_KEY_TOKEN_REGEX = _token_regex(BARE_KEY_TOKEN, whitespace='')
+COMMENT_TOKEN_REGEX = _token_regex(COMMENT_TOKEN, whitespace='')
 
-# DATETIME_REGEX = re.compile(r'(?P<res>' + rfc3339_regex.pattern + ')')
+# separators are matched together with the whitespace before them
+# "=" takes the whitespace after it as well, so that the value starts right at the cursor
+EQUALS_TOKEN_REGEX = re.compile(r'[ \t]*(?P<equals>=)[ \t]*')
+TABLE_NAME_SEPARATOR_TOKEN_REGEX = _token_regex(DOT_TOKEN)
+TABLE_END_TOKEN_REGEX = _token_regex(TABLE_END_TOKEN)
+# arrays may span several lines
+ARRAY_SEPARATOR_TOKEN_REGEX = _token_regex(COMMA_TOKEN, ARRAY_END_TOKEN, whitespace=r'[ \t\r\n]*')
+INLINE_TABLE_SEPARATOR_TOKEN_REGEX = _token_regex(COMMA_TOKEN, INLINE_TABLE_END_TOKEN)
 
-ENCLOSING_WHITESPACE_CHARS = re.compile(r'(?P<res>([ \t]|\n)*)')
-WHITESPACE_REGEX = re.compile(r'(?P<res>([ \t])*)')
-# KEYWORD_REGEX = re.compile(r'[0-9a-zA-Z-_]+')
-# ENCLOSING_WHITESPACE_CHARS = re.compile(r'(?P<res>[ \t]|\n)*') # space or tab OR just \n
+# body of a table, which is skipped without building values (see parser.skip_table_body):
+# only strings, comments and array brackets matter to find the next table header
+TABLE_BODY_TOKEN_REGEX = re.compile(r'(?P<newline>\r?\n[ \t\r\n]*)'
+                                    r'|(?P<string>' + '|'.join([ML_BASIC_STRING_TOKEN[1], BASIC_STRING_TOKEN[1],
+                                                               ML_LITERAL_STRING_TOKEN[1],
+                                                               LITERAL_STRING_TOKEN[1]]) + ')'
+                                    r'|(?P<comment>#[^\r\n]*)'
+                                    r'|(?P<array_start>\[)'
+                                    r'|(?P<array_end>\])'
+                                    r'|(?P<text>[^\r\n"\'#\[\]]+|.)')
+
+
+_BYTES_REGEXES = {}  # type: Dict[Pattern, Pattern]
+
+
+def bytes_regex(regex: Pattern) -> Pattern:
+    # the same regex to run over bytes (see source.BytesSource), all the patterns above are ASCII-only
+    bytes_version = _BYTES_REGEXES.get(regex)
+    if bytes_version is None:
+        bytes_version = re.compile(regex.pattern.encode('ascii'))
+        _BYTES_REGEXES[regex] = bytes_version
 
-COMMENT_REGEX = re.compile(r'(?P<res>([^\n]*))(?:\n|\Z)')
+    return bytes_version
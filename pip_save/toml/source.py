@@ -1,20 +1,80 @@
-from typing import Match
+from bisect import bisect_left
+from collections import namedtuple
+from typing import List, Match, Tuple
 from typing import Pattern, Optional
 from typing import Union
 
+from pip_save.toml.regex import bytes_regex, NEWLINE_REGEX
+
 
 class InvalidTomlError(RuntimeError):
-    pass
+    # If the source is given, the message is a template, which is formatted only when the error
+    # is printed, with the text at pos as {text} and format_args. Parsing code can raise and
+    # catch these cheaply.
+    def __init__(self, message: str = '', source: 'Source' = None, pos: int = None, **format_args) -> None:
+        super().__init__(message)
+        self.message = message
+        self.source = source
+        self.pos = pos
+        self.format_args = format_args
+        # position, which is kept after the source is detached
+        self._line_col = None  # type: Optional[Tuple[int, int]]
+
+    @property
+    def line_col(self) -> Optional[Tuple[int, int]]:
+        if self.source is None:
+            return self._line_col
+
+        return self.source.line_col(self.pos)
+
+    def detach_source(self) -> None:
+        # formats the message and drops the source, e.g. before its buffer is closed
+        if self.source is None:
+            return
+
+        self._line_col = self.line_col
+        self.message = self.message.format(text=self.source.preview(pos=self.pos), **self.format_args)
+        self.format_args = {}
+        self.source = None
+
+    def __str__(self):
+        if self.source is None:
+            if self._line_col is None:
+                return self.message
+
+            line, col = self._line_col
+            return '{message} (line {line}, column {col})'.format(message=self.message, line=line, col=col)
+
+        line, col = self.line_col
+        message = self.message.format(text=self.source.preview(pos=self.pos), **self.format_args)
+        return '{message} (line {line}, column {col})'.format(message=message, line=line, col=col)
 
 
 class ExpectationError(InvalidTomlError):
     pass
 
 
+_WHITESPACE_CHARS = frozenset(' \t\r\n')
+
+
+# kind is the name of the matched group of the token regex, offset is the position of the token text
+Token = namedtuple('Token', ['kind', 'text', 'offset'])
+
+
 class Source(object):
-    def __init__(self, text: str) -> None:
+    def __init__(self, text: str, pos: int = 0, first_line: int = 1) -> None:
+        # original text is never copied, only the cursor position moves
         self._text = text  # type: str
+        self._pos = pos  # type: int
         self._last_consumed = None  # type: Optional[Union[Match, str]]
+        # number of the line text starts at, if it's a part of a bigger document
+        self._first_line = first_line  # type: int
+        # offsets of all the newlines in the text, built on the first request for the error position
+        self._newline_offsets = None  # type: Optional[List[int]]
+
+    @property
+    def pos(self) -> int:
+        return self._pos
 
     @property
     def last_consumed(self) -> str:
@@ -24,9 +84,35 @@ class Source(object):
 
         return self._last_consumed
 
+    def slice(self, start: int, end: int) -> str:
+        return self._text[start:end]
+
+    def preview(self, length: int = 100, pos: Optional[int] = None) -> str:
+        if pos is None:
+            pos = self._pos
+        return self._text[pos:pos + length]
+
+    def line_col(self, pos: Optional[int] = None) -> Tuple[int, int]:
+        # 1-based line and column of the position, O(log n) after the index is built
+        if pos is None:
+            pos = self._pos
+
+        if self._newline_offsets is None:
+            self._newline_offsets = [match.start() for match in self._iter_newlines()]
+
+        line = bisect_left(self._newline_offsets, pos)
+        line_start = self._newline_offsets[line - 1] + 1 if line > 0 else 0
+        return self._first_line + line, pos - line_start + 1
+
+    def _iter_newlines(self):
+        return NEWLINE_REGEX.finditer(self._text)
+
     # EOF
+    def seek_eof(self) -> bool:
+        return self._pos >= len(self._text)
+
     def consume_eof(self) -> bool:
-        if not self._text:
+        if self.seek_eof():
             self._last_consumed = ''
             return True
         return False
@@ -34,47 +120,96 @@ class Source(object):
     def expect_eof(self) -> None:
         is_eof_consumed = self.consume_eof()
         if not is_eof_consumed:
-            raise ExpectationError('No EOF present.')
+            raise ExpectationError('No EOF present, found "{text}"', self, self._pos)
 
     # any text chunk
     def consume(self, text_chunk: str) -> bool:
-        if not self._text.startswith(text_chunk):
+        if not self._text.startswith(text_chunk, self._pos):
             return False
 
-        self._text = self._text[len(text_chunk):]
+        self._pos += len(text_chunk)
         self._last_consumed = text_chunk
         return True
 
     def expect(self, text_chunk: str) -> None:
         is_consumed = self.consume(text_chunk)
         if not is_consumed:
-            raise ExpectationError('"{text}" does not contain match for string "{string}"'
-                                   .format(text=self._text[:100],
-                                           string=text_chunk))
+            raise ExpectationError('"{text}" does not contain match for string "{string}"', self, self._pos,
+                                   string=text_chunk)
 
     # regex
     def consume_regex(self, regex: Pattern) -> bool:
-        match = regex.match(self._text)
+        match = regex.match(self._text, self._pos)
         if not match:
             return False
 
-        self._text = self._text[len(match.group('res')):]
+        self._pos = match.end('res')
         self._last_consumed = match
         return True
 
     def expect_regex(self, regex: Pattern) -> None:
         match = self.consume_regex(regex)
         if not match:
-            raise ExpectationError('{text} does not contain match for regex {regex}'
-                                   .format(text=self._text[:100],
-                                           regex=regex))
+            raise ExpectationError('"{text}" does not contain match for regex {regex}', self, self._pos,
+                                   regex=regex)
+
+    # tokens
+    def consume_token(self, regex: Pattern) -> Optional[Token]:
+        match = regex.match(self._text, self._pos)
+        if not match:
+            return None
+
+        kind = match.lastgroup
+        self._pos = match.end()
+        return Token(kind, match.group(kind), match.start(kind))
+
+    def expect_token(self, regex: Pattern) -> Token:
+        match = self.expect_match(regex)
+        kind = match.lastgroup
+        return Token(kind, match.group(kind), match.start(kind))
+
+    def expect_match(self, regex: Pattern) -> Match:
+        # cheaper than expect_token on the hot path, when the parser needs only the matched text
+        match = regex.match(self._text, self._pos)
+        if not match:
+            raise ExpectationError('"{text}" does not start with any of the tokens: {kinds}', self, self._pos,
+                                   kinds=', '.join(regex.groupindex))
+
+        self._pos = match.end()
+        return match
+
+    def next_char(self, whitespace: Pattern) -> str:
+        # skip optional whitespace and return the character after it, '' on EOF
+        pos = self._pos
+        char = self._text[pos:pos + 1]
+        if char in _WHITESPACE_CHARS:
+            pos = whitespace.match(self._text, pos).end()
+            self._pos = pos
+            char = self._text[pos:pos + 1]
+
+        return char
+
+    def consume_quoted(self, quote: str, invalid_chars: Pattern) -> Optional[str]:
+        # fast path for strings at the cursor: the closing quote is found with str.find and the content
+        # is returned as is. Returns None and doesn't move, if the content contains invalid_chars
+        # (escape sequences included) or the quote isn't closed, the caller falls back to the token regex.
+        start = self._pos + len(quote)
+        end = self._text.find(quote, start)
+        if end == -1:
+            return None
+
+        if invalid_chars.search(self._text, start, end):
+            return None
+
+        self._pos = end + len(quote)
+        return self._text[start:end]
 
     # check if next, but don't advance
     def seek(self, s: str) -> bool:
-        return self._text.startswith(s)
+        return self._text.startswith(s, self._pos)
 
     def seek_regex(self, rgx: Pattern) -> bool:
-        match = rgx.match(self._text)
+        match = rgx.match(self._text, self._pos)
         return bool(match)
 
         # def record_current_state(self):
@@ -101,3 +236,119 @@ class Source(object):
         #     else:
         #         # remove last recorded state
         #         source.backtrack_stack.pop()
+
+
+def _decode(data: bytes, offset: int) -> str:
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        raise InvalidTomlError('Invalid UTF-8 at position {pos}: {reason}'
+                               .format(pos=offset + e.start, reason=e.reason))
+
+
+class _DecodedMatch(object):
+    # match over bytes, which returns the matched text decoded
+    __slots__ = ('_match',)
+
+    def __init__(self, match: Match) -> None:
+        self._match = match
+
+    @property
+    def lastgroup(self) -> Optional[str]:
+        return self._match.lastgroup
+
+    def group(self, *groups) -> str:
+        return _decode(self._match.group(*groups), self._match.start(*groups))
+
+    def start(self, *groups) -> int:
+        return self._match.start(*groups)
+
+    def end(self, *groups) -> int:
+        return self._match.end(*groups)
+
+
+class BytesSource(Source):
+    # Source over UTF-8 encoded bytes or any other buffer (like mmap.mmap), which regexes accept.
+    # The buffer is never decoded as a whole, only the text of the returned tokens is.
+    def slice(self, start: int, end: int) -> str:
+        return _decode(self._text[start:end], start)
+
+    def preview(self, length: int = 100, pos: Optional[int] = None) -> str:
+        if pos is None:
+            pos = self._pos
+        return self._text[pos:pos + length].decode('utf-8', errors='replace')
+
+    def _iter_newlines(self):
+        return bytes_regex(NEWLINE_REGEX).finditer(self._text)
+
+    def consume(self, text_chunk: str) -> bool:
+        chunk = text_chunk.encode('utf-8')
+        if self._text[self._pos:self._pos + len(chunk)] != chunk:
+            return False
+
+        self._pos += len(chunk)
+        self._last_consumed = text_chunk
+        return True
+
+    def consume_regex(self, regex: Pattern) -> bool:
+        match = bytes_regex(regex).match(self._text, self._pos)
+        if not match:
+            return False
+
+        self._pos = match.end('res')
+        self._last_consumed = _DecodedMatch(match)
+        return True
+
+    def consume_token(self, regex: Pattern) -> Optional[Token]:
+        match = bytes_regex(regex).match(self._text, self._pos)
+        if not match:
+            return None
+
+        match = _DecodedMatch(match)
+        kind = match.lastgroup
+        self._pos = match.end()
+        return Token(kind, match.group(kind), match.start(kind))
+
+    def expect_match(self, regex: Pattern) -> Match:
+        match = bytes_regex(regex).match(self._text, self._pos)
+        if not match:
+            raise ExpectationError('"{text}" does not start with any of the tokens: {kinds}', self, self._pos,
+                                   kinds=', '.join(regex.groupindex))
+
+        self._pos = match.end()
+        return _DecodedMatch(match)
+
+    def next_char(self, whitespace: Pattern) -> str:
+        pos = self._pos
+        if pos >= len(self._text):
+            return ''
+
+        # only ASCII chars start the tokens, the rest never match the dispatch tables
+        char = chr(self._text[pos])
+        if char in _WHITESPACE_CHARS:
+            pos = bytes_regex(whitespace).match(self._text, pos).end()
+            self._pos = pos
+            char = chr(self._text[pos]) if pos < len(self._text) else ''
+
+        return char
+
+    def consume_quoted(self, quote: str, invalid_chars: Pattern) -> Optional[str]:
+        quote_bytes = quote.encode('utf-8')
+        start = self._pos + len(quote_bytes)
+        end = self._text.find(quote_bytes, start)
+        if end == -1:
+            return None
+
+        if bytes_regex(invalid_chars).search(self._text, start, end):
+            return None
+
+        self._pos = end + len(quote_bytes)
+        return _decode(self._text[start:end], start)
+
+    def seek(self, s: str) -> bool:
+        chunk = s.encode('utf-8')
+        return self._text[self._pos:self._pos + len(chunk)] == chunk
+
+    def seek_regex(self, rgx: Pattern) -> bool:
+        match = bytes_regex(rgx).match(self._text, self._pos)
+        return bool(match)
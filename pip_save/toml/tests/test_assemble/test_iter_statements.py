@@ -0,0 +1,73 @@
+from io import StringIO
+from unittest import TestCase
+
+from pip_save.toml.assemble import iter_statements, parse_statements, parse_toml
+from pip_save.toml.parser import KVEntry, ParsedTable, Comment
+from pip_save.toml.source import InvalidTomlError
+
+TEXT = """
+# project
+name = "doc"
+version = 1.25
+
+[deps]
+django = "==1.10.2"  # pinned
+flask = {version = "==0.11", markers = "python_version >= '3.5'"}
+
+[dev_deps]
+array = [
+    1,
+    2,
+]
+license = \"\"\"
+multiline
+text\"\"\"
+"""
+
+
+class CountingStringIO(StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.read_chars = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.read_chars += len(chunk)
+        return chunk
+
+
+class TestIterStatements(TestCase):
+    def test_text_statements(self):
+        statements = list(iter_statements('[deps]\n# hello\ndjango = "1.10"'))
+        self.assertEqual(statements, [ParsedTable(('deps',)),
+                                      Comment(' hello'),
+                                      KVEntry('django', '1.10')])
+
+    def test_file_statements_are_the_same_for_any_chunk_size(self):
+        expected = parse_statements(TEXT)
+        for chunk_size in [1, 2, 3, 7, 16, 1024]:
+            statements = list(iter_statements(StringIO(TEXT), chunk_size=chunk_size))
+            self.assertEqual(statements, expected, 'chunk_size={}'.format(chunk_size))
+
+    def test_stop_reading_file_early(self):
+        fp = CountingStringIO('[deps]\ndjango = "1.10"\n' + 'key = 1\n' * 10000)
+        for statement in iter_statements(fp, chunk_size=64):
+            if isinstance(statement, KVEntry):
+                break
+
+        self.assertTrue(fp.read_chars < 256)
+
+    def test_invalid_file(self):
+        with self.assertRaises(InvalidTomlError):
+            list(iter_statements(StringIO('[deps]\ndjango = \n'), chunk_size=4))
+
+    def test_parse_toml_from_file(self):
+        self.assertEqual(parse_toml(StringIO(TEXT)), parse_toml(TEXT))
+
+    def test_invalid_file_error_position(self):
+        text = '[deps]\n' + 'key = 1\n' * 100 + 'django = \n'
+        for chunk_size in [4, 1024]:
+            with self.assertRaises(InvalidTomlError) as cm:
+                list(iter_statements(StringIO(text), chunk_size=chunk_size))
+
+            self.assertEqual(cm.exception.line_col, (102, 10))
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pip_save.toml.assemble import parse_toml, parse_toml_file
+from pip_save.toml.model import Root, Table
+from pip_save.toml.source import InvalidTomlError
+from pip_save.toml.writer import to_toml
+
+TEXT = """
+# comment
+name = "pip-save"
+description = \"\"\"
+multiline \\
+  string
+with ünicode\"\"\"
+raw = '''
+first
+second'''
+numbers = [
+  1,
+  2
+]
+
+[deps]
+"django-ü" = "==1.10.2"
+
+[tool.lint]
+ignore = ["E501"]
+""".lstrip()
+
+
+class TestParseTomlFile(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fpath = os.path.join(self.tmp_dir, 'pypm.toml')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, content: bytes):
+        with open(self.fpath, 'wb') as f:
+            f.write(content)
+
+    def test_same_as_parse_toml(self):
+        self.write(TEXT.encode('utf-8'))
+
+        root = parse_toml_file(self.fpath)
+        self.assertEqual(root, parse_toml(TEXT))
+        self.assertEqual(root['description'], '\nmultiline string\nwith ünicode')
+        self.assertEqual(to_toml(root), to_toml(parse_toml(TEXT)))
+
+    def test_crlf_line_endings(self):
+        self.write(TEXT.replace('\n', '\r\n').encode('utf-8'))
+
+        root = parse_toml_file(self.fpath)
+        self.assertEqual(root, parse_toml(TEXT))
+        self.assertEqual(root['raw'], '\nfirst\nsecond')
+        self.assertEqual(parse_toml(TEXT.replace('\n', '\r\n')), root)
+
+    def test_crlf_line_endings_in_skipped_tables(self):
+        self.write(TEXT.replace('\n', '\r\n').encode('utf-8'))
+
+        root = parse_toml_file(self.fpath, tables={'deps'})
+        self.assertEqual(root['deps'], Table(nodes={'django-ü': '==1.10.2'}))
+        self.assertEqual(root.statement_nodes[('tool', 'lint')].text, '[tool.lint]\nignore = ["E501"]')
+
+    def test_empty_file(self):
+        self.write(b'')
+        self.assertEqual(parse_toml_file(self.fpath), Root())
+
+    def test_invalid_utf8(self):
+        self.write('name = "ü"'.encode('latin-1'))
+        with self.assertRaises(InvalidTomlError):
+            parse_toml_file(self.fpath)
+
+    def test_error_position(self):
+        self.write(b'name = "pip-save"\nversion = \n')
+        with self.assertRaises(InvalidTomlError) as cm:
+            parse_toml_file(self.fpath)
+
+        self.assertEqual(cm.exception.line_col, (2, 11))
+        self.assertIn('(line 2, column 11)', str(cm.exception))
+
+    def test_mapped_file_without_original_text(self):
+        self.write(TEXT.replace('\n', '\r\n').encode('utf-8'))
+
+        root = parse_toml_file(self.fpath, keep_original_text=False)
+        self.assertEqual(root, parse_toml(TEXT))
+        self.assertIsNone(root.original_text)
+        self.assertEqual(root['description'], '\nmultiline string\nwith ünicode')
+        self.assertEqual(parse_toml(to_toml(root)), root)
+
+    def test_error_position_in_mapped_file(self):
+        self.write(b'name = "pip-save"\nversion = \n')
+        with self.assertRaises(InvalidTomlError) as cm:
+            parse_toml_file(self.fpath, keep_original_text=False)
+
+        self.assertEqual(cm.exception.line_col, (2, 11))
+        self.assertIn('(line 2, column 11)', str(cm.exception))
+
+    def test_empty_mapped_file(self):
+        self.write(b'')
+        self.assertEqual(parse_toml_file(self.fpath, keep_original_text=False), Root())
@@ -0,0 +1,82 @@
+from io import StringIO
+from unittest import TestCase
+
+from pip_save.toml.assemble import parse_toml, iter_statements
+from pip_save.toml.model import Root, Table, UnparsedTable, NotSupported
+from pip_save.toml.parser import SkippedTable, KVEntry
+from pip_save.toml.writer import to_toml
+
+TEXT = """
+name = "doc"
+
+[deps]
+django = "==1.10.2"
+
+[tool.lint]
+ignore = [
+[1, 2],
+[3]
+]
+header = \"\"\"
+[not.a.table]
+\"\"\"
+weird   =    'formatting'   # kept
+
+[dev_deps]
+pytest = "==3.0"
+""".strip()
+
+
+class TestSelectiveParsing(TestCase):
+    def test_skipped_tables_are_not_loaded(self):
+        root = parse_toml(TEXT, tables={'deps', 'dev_deps'})
+
+        self.assertEqual(root, Root(nodes={
+            'name': 'doc',
+            'deps': Table(nodes={'django': '==1.10.2'}),
+            'dev_deps': Table(nodes={'pytest': '==3.0'}),
+        }))
+
+    def test_skipped_table_text_is_kept(self):
+        root = parse_toml(TEXT, tables={'deps', 'dev_deps'})
+        unparsed = root.statement_nodes[('tool', 'lint')]
+
+        self.assertTrue(isinstance(unparsed, UnparsedTable))
+        self.assertTrue(unparsed.text.startswith('[tool.lint]\nignore = ['))
+        self.assertTrue(unparsed.text.endswith("'formatting'   # kept"))
+
+    def test_skipped_tables_are_written_back_unchanged(self):
+        root = parse_toml(TEXT, tables={'deps', 'dev_deps'})
+        root['deps']['flask'] = '==0.11'
+
+        unparsed_text = root.statement_nodes[('tool', 'lint')].text
+
+        output = to_toml(root)
+        self.assertIn('\n' + unparsed_text + '\n', output)
+        self.assertIn('flask = "==0.11"', output)
+        self.assertEqual(parse_toml(output, tables={'deps', 'dev_deps'}), root)
+
+    def test_skipped_table_cannot_be_overridden(self):
+        root = parse_toml(TEXT, tables={'deps'})
+        with self.assertRaises(NotSupported):
+            root['tool.lint'] = Table()
+
+    def test_file_statements_with_skipped_tables(self):
+        expected = list(iter_statements(TEXT, tables={'deps'}))
+        self.assertEqual(expected[2], KVEntry('django', '==1.10.2'))
+        self.assertEqual(expected[3].name, ('tool', 'lint'))
+        self.assertTrue(isinstance(expected[3], SkippedTable))
+        self.assertEqual(expected[4], SkippedTable(('dev_deps',), '[dev_deps]\npytest = "==3.0"'))
+
+        for chunk_size in [1, 5, 64]:
+            statements = list(iter_statements(StringIO(TEXT), chunk_size=chunk_size, tables={'deps'}))
+            self.assertEqual(statements, expected)
+
+    def test_multiline_string_split_by_chunks(self):
+        text = 'a = 1\n[tool]\nx = """\n[fake]\nmore\n"""\n[deps]\nd = "1"\n'
+        expected = list(iter_statements(text, tables={'deps'}))
+        self.assertEqual(expected[1], SkippedTable(('tool',), '[tool]\nx = """\n[fake]\nmore\n"""'))
+
+        for chunk_size in [1, 5, 16, 64]:
+            statements = list(iter_statements(StringIO(text), chunk_size=chunk_size, tables={'deps'}))
+            self.assertEqual(statements, expected, 'chunk_size={}'.format(chunk_size))
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest import mock
+
+from pip_save.toml import cache
+from pip_save.toml.cache import parse_toml_cached, evict_entries, NO_CACHE_ENV_VAR
+from pip_save.toml.model import Root, Table
+
+TEXT = """
+[deps]
+django = "==1.10.2"
+"""
+
+
+class TestParseCache(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        self.fpath = os.path.join(self.tmp_dir, 'pypm.toml')
+        self.write(TEXT)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, text, mtime_ns=None):
+        with open(self.fpath, 'w') as f:
+            f.write(text)
+        if mtime_ns is not None:
+            os.utime(self.fpath, ns=(mtime_ns, mtime_ns))
+
+    def parse(self):
+        return parse_toml_cached(self.fpath, cache_dir=self.cache_dir)
+
+    def test_unchanged_file_is_not_parsed(self):
+        expected = Root(nodes={'deps': Table(nodes={'django': '==1.10.2'})})
+        self.assertEqual(self.parse(), expected)
+
+        with mock.patch.object(cache, 'parse_toml') as parse_toml:
+            self.assertEqual(self.parse(), expected)
+            parse_toml.assert_not_called()
+
+    def test_touched_file_is_validated_by_hash(self):
+        self.write(TEXT, mtime_ns=10 ** 18)
+        self.parse()
+        self.write(TEXT, mtime_ns=2 * 10 ** 18)
+
+        with mock.patch.object(cache, 'parse_toml') as parse_toml:
+            self.assertEqual(self.parse()['deps']['django'], '==1.10.2')
+            parse_toml.assert_not_called()
+
+    def test_changed_file_is_parsed(self):
+        self.write(TEXT, mtime_ns=10 ** 18)
+        self.parse()
+        self.write(TEXT.replace('1.10.2', '1.10.3'), mtime_ns=2 * 10 ** 18)
+
+        self.assertEqual(self.parse()['deps']['django'], '==1.10.3')
+
+    def test_changes_to_the_result_are_not_cached(self):
+        self.parse()['deps']['flask'] = '==0.11'
+        self.assertNotIn('flask', self.parse()['deps'])
+
+    def test_corrupted_entry_is_ignored(self):
+        self.parse()
+        for fname in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, fname), 'wb') as f:
+                f.write(b'garbage')
+
+        self.assertEqual(self.parse()['deps']['django'], '==1.10.2')
+
+    def test_cache_can_be_disabled(self):
+        with mock.patch.dict(os.environ, {NO_CACHE_ENV_VAR: '1'}):
+            self.parse()
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        os.makedirs(self.cache_dir)
+        for i in range(3):
+            path = os.path.join(self.cache_dir, '{}.pickle'.format(i))
+            with open(path, 'wb') as f:
+                f.write(b'x' * 10)
+            os.utime(path, ns=(i * 10 ** 9, i * 10 ** 9))
+
+        evict_entries(self.cache_dir, max_size=20)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ['1.pickle', '2.pickle'])
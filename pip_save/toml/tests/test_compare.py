@@ -0,0 +1,72 @@
+from unittest import TestCase
+
+from pip_save.toml import diff
+from pip_save.toml.assemble import parse_toml
+from pip_save.toml.compare import NodeDiff
+from pip_save.toml.model import ChangeEventType
+
+
+class TestDiff(TestCase):
+    TEXT = """
+name = 'pip-save'
+
+[deps]
+django = "==1.10.2"
+flask = "==0.11"
+
+[dev_deps]
+pytest = "==3.0"
+"""
+
+    def assertDiff(self, new_text, expected_diffs):
+        root_a = parse_toml(self.TEXT)
+        root_b = parse_toml(new_text)
+        self.assertEqual(list(diff(root_a, root_b)), expected_diffs)
+
+    def test_same_documents(self):
+        self.assertDiff(self.TEXT.replace('\n\n', '\n').replace('[deps]\n', '[deps]\n# pinned\n'), [])
+
+    def test_changed_keywords(self):
+        self.assertDiff(self.TEXT.replace('==0.11', '==0.12').replace("'pip-save'", "'pip_save'"), [
+            NodeDiff(ChangeEventType.SetValue, ('name',), 'pip-save', 'pip_save'),
+            NodeDiff(ChangeEventType.SetValue, ('deps', 'flask'), '==0.11', '==0.12'),
+        ])
+
+    def test_added_and_removed_keywords(self):
+        new_text = self.TEXT.replace('django = "==1.10.2"\n', '').replace('[dev_deps]\n', '[dev_deps]\nmock = "==2.0"\n')
+        self.assertDiff(new_text, [
+            NodeDiff(ChangeEventType.Remove, ('deps', 'django'), '==1.10.2', None),
+            NodeDiff(ChangeEventType.Add, ('dev_deps', 'mock'), None, '==2.0'),
+        ])
+
+    def test_added_and_removed_tables(self):
+        root_a = parse_toml(self.TEXT)
+        root_b = parse_toml(self.TEXT.replace('[dev_deps]\npytest = "==3.0"\n', '[tools.lint]\nwidth = 120\n'))
+
+        self.assertEqual([(node_diff.type, node_diff.node_name) for node_diff in diff(root_a, root_b)], [
+            (ChangeEventType.Remove, ('dev_deps',)),
+            (ChangeEventType.Remove, ('dev_deps', 'pytest')),
+            (ChangeEventType.Add, ('tools', 'lint')),
+            (ChangeEventType.Add, ('tools', 'lint', 'width')),
+        ])
+
+    def test_values_changed_in_place(self):
+        root_a = parse_toml(self.TEXT)
+        root_b = parse_toml(self.TEXT)
+        self.assertEqual(list(diff(root_a, root_b)), [])
+
+        root_b['deps']['flask'] = ['==0.11']
+        root_a['deps']['flask'] = ['==0.11']
+        list(diff(root_a, root_b))  # the hashes are computed before the change
+        root_b['deps']['flask'].append('<1.0')
+        self.assertEqual(list(diff(root_a, root_b)), [
+            NodeDiff(ChangeEventType.SetValue, ('deps', 'flask'), ['==0.11'], ['==0.11', '<1.0']),
+        ])
+
+    def test_unparsed_tables(self):
+        root_a = parse_toml(self.TEXT, tables={'deps'})
+        root_b = parse_toml(self.TEXT.replace('==3.0', '==3.1'), tables={'deps'})
+
+        self.assertEqual([(node_diff.type, node_diff.node_name) for node_diff in diff(root_a, root_b)], [
+            (ChangeEventType.SetValue, ('dev_deps',)),
+        ])
@@ -2,6 +2,7 @@ from unittest import TestCase
 
 from pip_save.toml.assemble import parse_toml
 from pip_save.toml.model import Root, Table
+from pip_save.toml.writer import to_toml
 
 
 class TestRoot(TestCase):
@@ -81,3 +82,292 @@ hello = "world"
         root = parse_toml(text.strip())
         with self.assertRaises(KeyError):
             root['table']['hey'] = 'ohmy'
+
+    def test_nodes_are_compact(self):
+        text = """
+[deps]
+django = "==1.10.2"
+[dev_deps]
+django = "==1.10.2"
+        """
+        root = parse_toml(text.strip())
+
+        self.assertFalse(hasattr(root, '__dict__'))
+        self.assertFalse(hasattr(root['deps'], '__dict__'))
+        deps_key, = root['deps'].nodes.keys()
+        dev_deps_key, = root['dev_deps'].nodes.keys()
+        self.assertIs(deps_key, dev_deps_key)
+
+    def test_replace_table_with_keyword(self):
+        root = parse_toml('a = 1\n[x]\n')
+        root['x'] = 2
+
+        self.assertEqual(root.statement_nodes.items(), [(('a',), 1), (('x',), 2)])
+        self.assertEqual(to_toml(root), 'a = 1\nx = 2\n')
+
+    def test_remove_table_key(self):
+        text = """
+[table]
+hello = "world"
+        """
+        root = parse_toml(text.strip())
+        del root['table']['hello']
+
+        self.assertTrue(('table', 'hello') not in root.statement_nodes)
+
+
+class TestBatch(TestCase):
+    TEXT = """
+[deps]
+django = "==1.10.2"
+flask = "==0.11"
+[dev_deps]
+pytest = "==3.0"
+    """
+
+    def test_changes_are_applied_on_exit(self):
+        root = parse_toml(self.TEXT.strip())
+        with root.batch():
+            root['deps']['celery'] = '==4.0'
+            root['deps']['django'] = '==1.11'
+            del root['dev_deps']['pytest']
+
+            self.assertTrue(('deps', 'celery') not in root.statement_nodes)
+            self.assertEqual(root.statement_nodes[('deps', 'django')], '==1.10.2')
+
+        self.assertEqual(root.statement_nodes.keys(), [('deps',), ('deps', 'django'), ('deps', 'flask'),
+                                                       ('deps', 'celery'), ('dev_deps',)])
+        self.assertEqual(root.statement_nodes[('deps', 'django')], '==1.11')
+
+    def test_events_are_merged(self):
+        root = parse_toml(self.TEXT.strip())
+        with root.batch():
+            # add, then set
+            root['deps']['celery'] = '==3.0'
+            root['deps']['celery'] = '==4.0'
+            # add, then remove
+            root['deps']['requests'] = '==2.0'
+            del root['deps']['requests']
+            # remove, then add back keeps the position
+            del root['deps']['django']
+            root['deps']['django'] = '==1.11'
+            # set, then remove
+            root['deps']['flask'] = '==0.12'
+            del root['deps']['flask']
+
+            self.assertEqual(len(root._pending_events), 3)
+
+        self.assertEqual(root.statement_nodes.items(), [(('deps',), root['deps']),
+                                                        (('deps', 'django'), '==1.11'),
+                                                        (('deps', 'celery'), '==4.0'),
+                                                        (('dev_deps',), root['dev_deps']),
+                                                        (('dev_deps', 'pytest'), '==3.0')])
+
+    def test_nested_batch_is_applied_by_the_outer_one(self):
+        root = parse_toml(self.TEXT.strip())
+        with root.batch():
+            with root.batch():
+                root['deps']['celery'] = '==4.0'
+            self.assertTrue(('deps', 'celery') not in root.statement_nodes)
+
+        self.assertTrue(('deps', 'celery') in root.statement_nodes)
+
+
+class TestGetPath(TestCase):
+    TEXT = """
+name = 'pip-save'
+
+[deps]
+django = {version = "==1.10.2"}
+
+[tools.lint]
+"max line" = 120
+"""
+
+    def test_tuple_and_dotted_paths(self):
+        root = parse_toml(self.TEXT.strip())
+
+        self.assertEqual(root.get_path(('name',)), 'pip-save')
+        self.assertEqual(root.get_path('deps.django'), {'version': '==1.10.2'})
+        self.assertEqual(root.get_path('deps.django.version'), '==1.10.2')
+        self.assertEqual(root.get_path('tools.lint."max line"'), 120)
+        self.assertIs(root.get_path(('tools',)), root['tools'])
+        self.assertIs(root.get_path(()), root)
+
+    def test_missing_path(self):
+        root = parse_toml(self.TEXT.strip())
+
+        with self.assertRaises(KeyError):
+            root.get_path('deps.flask')
+        with self.assertRaises(KeyError):
+            root.get_path('name.first')
+
+    def test_index_follows_changes(self):
+        root = parse_toml(self.TEXT.strip())
+        root['deps']['django'] = '==1.11'
+        root['deps']['flask'] = '==0.11'
+        root['tools.format'] = Table()
+        root['tools']['format']['width'] = 100
+        del root['name']
+
+        self.assertEqual(root.get_path('deps.django'), '==1.11')
+        self.assertEqual(root.get_path('deps.flask'), '==0.11')
+        self.assertEqual(root.get_path('tools.format.width'), 100)
+        with self.assertRaises(KeyError):
+            root.get_path('name')
+
+    def test_changes_in_batch(self):
+        root = parse_toml(self.TEXT.strip())
+        with root.batch():
+            root['deps']['flask'] = '==0.11'
+            self.assertEqual(root.get_path('deps.flask'), '==0.11')
+
+
+class TestSnapshot(TestCase):
+    TEXT = TestGetPath.TEXT
+
+    def test_snapshot_doesnt_see_changes(self):
+        root = parse_toml(self.TEXT.strip())
+        snapshot = root.snapshot()
+        root['deps']['flask'] = '==0.11'
+        root['tools']['lint']['max line'] = 100
+        del root['name']
+        root['docs'] = Table()
+
+        self.assertEqual(snapshot['deps'].nodes, {'django': {'version': '==1.10.2'}})
+        self.assertEqual(snapshot.get_path('tools.lint."max line"'), 120)
+        self.assertEqual(snapshot['name'], 'pip-save')
+        self.assertTrue('docs' not in snapshot)
+        self.assertEqual(to_toml(snapshot), self.TEXT.lstrip())
+
+        self.assertEqual(root.get_path('tools.lint."max line"'), 100)
+        self.assertTrue('flask' in root['deps'])
+
+    def test_writes_dont_copy_the_nodes(self):
+        root = parse_toml(self.TEXT.strip())
+        deps_nodes = root['deps'].nodes
+        statement_nodes = root.statement_nodes
+        snapshot = root.snapshot()
+        root['deps']['flask'] = '==0.11'
+        root['deps']['celery'] = '==4.0'
+
+        self.assertIs(root['deps'].nodes, deps_nodes)
+        self.assertIs(root.statement_nodes, statement_nodes)
+        self.assertIs(snapshot['deps'].nodes['django'], deps_nodes['django'])
+        self.assertEqual(set(snapshot['deps'].nodes), {'django'})
+
+    def test_snapshot_of_statement_nodes(self):
+        root = parse_toml(self.TEXT.strip())
+        snapshot = root.snapshot()
+        root['tools']['lint']['width'] = 100
+        root['tools.format'] = Table()
+        root['deps.extra'] = Table()
+        root['deps']['extra']['celery'] = '==4.0'
+        del root['deps']['django']
+        root['name'] = 'pip_save'
+        root['version'] = '0.1'
+        later_text = to_toml(root)
+        later_snapshot = root.snapshot()
+        del root['tools']['lint']['width']
+        del root['deps']['extra']['celery']
+
+        self.assertEqual(to_toml(snapshot), self.TEXT.lstrip())
+        self.assertEqual(snapshot.statement_nodes.keys(), [('name',), ('deps',), ('deps', 'django'),
+                                                           ('tools', 'lint'), ('tools', 'lint', 'max line')])
+        self.assertEqual(list(snapshot.statement_nodes.table_names()), [(), ('deps',), ('tools', 'lint')])
+        self.assertEqual(len(snapshot.statement_nodes), 5)
+        self.assertEqual(snapshot.dirty_nodes, set())
+        self.assertEqual(snapshot.statement_nodes.removed_spans(), [])
+
+        self.assertEqual(later_snapshot.get_path('deps.extra.celery'), '==4.0')
+        self.assertEqual(later_snapshot.get_path('tools.lint.width'), 100)
+        self.assertTrue(('deps', 'django') not in later_snapshot.statement_nodes)
+        self.assertEqual(list(later_snapshot.statement_nodes.table_names()),
+                         [(), ('deps',), ('tools', 'lint'), ('tools', 'format'), ('deps', 'extra')])
+        self.assertEqual(to_toml(later_snapshot), later_text)
+
+    def test_snapshots_of_different_versions(self):
+        root = parse_toml(self.TEXT.strip())
+        first_snapshot = root.snapshot()
+        root['deps']['flask'] = '==0.11'
+        second_snapshot = root.snapshot()
+        root['deps']['flask'] = '==0.12'
+
+        self.assertTrue('flask' not in first_snapshot['deps'])
+        self.assertEqual(second_snapshot.get_path('deps.flask'), '==0.11')
+        self.assertEqual(root.get_path('deps.flask'), '==0.12')
+
+    def test_snapshot_is_read_only(self):
+        snapshot = parse_toml(self.TEXT.strip()).snapshot()
+
+        with self.assertRaises(TypeError):
+            snapshot['deps']['flask'] = '==0.11'
+
+
+class TestContentHashes(TestCase):
+    TEXT = TestGetPath.TEXT
+
+    def test_equal_documents(self):
+        root = parse_toml(self.TEXT)
+        other_root = parse_toml(self.TEXT.replace('\n\n', '\n'))
+
+        self.assertEqual(root, other_root)
+        self.assertEqual(root.digest(), other_root.digest())
+        self.assertNotEqual(root, parse_toml(self.TEXT.replace('120', '100')))
+        self.assertNotEqual(root, parse_toml(self.TEXT.replace('120', '"120"')))
+
+    def test_hashes_follow_changes(self):
+        root = parse_toml(self.TEXT)
+        deps_digest = root['deps'].digest()
+        root_digest = root.digest()
+
+        root['tools']['lint']['max line'] = 100
+        self.assertEqual(root['deps'].digest(), deps_digest)
+        self.assertNotEqual(root.digest(), root_digest)
+
+        root['tools']['lint']['max line'] = 120
+        root['deps']['flask'] = '==0.11'
+        del root['deps']['flask']
+        self.assertEqual(root.digest(), root_digest)
+
+        root['docs.api'] = Table()
+        self.assertEqual(root, parse_toml(self.TEXT + '\n[docs.api]\n'))
+
+    def test_values_changed_in_place_are_compared(self):
+        root = parse_toml('[deps]\nx = [1]\n')
+        other_root = parse_toml('[deps]\nx = [1]\n')
+        self.assertEqual(root, other_root)
+
+        root['deps']['x'].append(2)
+        self.assertNotEqual(root, other_root)
+
+        table, other_table = Root(nodes={'a': 1}), Root(nodes={'a': 1})
+        self.assertEqual(table, other_table)
+        table.nodes['a'] = 2
+        self.assertNotEqual(table, other_table)
+
+    def test_stale_hashes_dont_tell_tables_apart(self):
+        root = parse_toml('[deps]\nx = [1]\n')
+        other_root = parse_toml('[deps]\nx = [1, 2]\n')
+        root.digest()
+        other_root.digest()
+
+        root['deps']['x'].append(2)
+        self.assertEqual(root, other_root)
+
+    def test_comments_dont_change_digest(self):
+        root = parse_toml(self.TEXT)
+        commented_root = parse_toml(self.TEXT.replace('[deps]\n', '[deps]\n# pinned\n'))
+
+        self.assertEqual(commented_root['deps'].digest(), root['deps'].digest())
+        self.assertNotEqual(commented_root, root)
+
+    def test_digest_is_the_same_after_changes_and_from_scratch(self):
+        root = parse_toml(self.TEXT)
+        root.digest()
+        root['deps']['flask'] = '==0.11'
+        root['tools']['lint']['width'] = 100
+
+        other_root = parse_toml(self.TEXT.replace('[tools.lint]\n', '[tools.lint]\nwidth = 100\n')
+                                         .replace('"==1.10.2"}\n', '"==1.10.2"}\nflask = "==0.11"\n'))
+        self.assertEqual(root.digest(), other_root.digest())
@@ -15,7 +15,7 @@ class ParseValueTestCase(TestCase):
         s = Source(original_text)
         parsed = parse_value(s)
         self.assertEqual(parsed, expected)
-        self.assertEqual(len(s._text), 0)
+        self.assertTrue(s.seek_eof())
 
 
 class ParseStatementTestCase(TestCase):
@@ -28,7 +28,7 @@ class ParseStatementTestCase(TestCase):
         s = Source(original_text)
         parsed = parse_statement(s)
         self.assertEqual(parsed, expected)
-        self.assertEqual(len(s._text), 0)
+        self.assertTrue(s.seek_eof())
 
 
 class ParseKeywordTestCase(TestCase):
@@ -36,14 +36,14 @@ class ParseKeywordTestCase(TestCase):
         s = Source(text)
         parsed = parse_keyword(s)
         self.assertEqual(parsed, expected)
-        self.assertEqual(len(s._text), 0)
+        self.assertTrue(s.seek_eof())
 
     def assertInvalidToml(self, text: str):
         s = Source(text)
         with self.assertRaises(InvalidTomlError):
             parse_keyword(s)
             # if parsed less than whole string, raise exception
-            if len(s._text) != 0:
+            if not s.seek_eof():
                 raise InvalidTomlError
                 # try:
                 #     parse_keyword(s)
@@ -19,6 +19,19 @@ class TestParseValue(ParseValueTestCase):
     def test_escapes_only_string(self):
         self.assertValueParsedCorrectly(r'"\n\t"', '\n\t')
 
+    def test_unicode_escapes(self):
+        self.assertValueParsedCorrectly(r'"\u0041\U0001F600x"', 'A\U0001F600x')
+
+    def test_escaped_quote(self):
+        self.assertValueParsedCorrectly(r'"say \"hello\""', 'say "hello"')
+
+    def test_control_chars_not_allowed(self):
+        self.assertInvalidToml('"hello\tworld"')
+
+    def test_unterminated_string(self):
+        self.assertInvalidToml('"hello')
+        self.assertInvalidToml('"hello\\"')
+
     # multiline string
     def test_multiline_string(self):
         self.assertValueParsedCorrectly('"""hello"""', 'hello')
@@ -35,6 +48,15 @@ class TestParseValue(ParseValueTestCase):
     def test_ml_escape_sequences(self):
         self.assertValueParsedCorrectly(r'"""hello\\world\n"""', 'hello\\world\n')
 
+    def test_ml_string_crlf(self):
+        self.assertValueParsedCorrectly('"""hello\r\nworld \\\r\n  !"""', 'hello\nworld !')
+
+    def test_ml_string_lone_cr_not_allowed(self):
+        self.assertInvalidToml('"""hello\rworld"""')
+
+    def test_unterminated_ml_string(self):
+        self.assertInvalidToml('"""hello""')
+
     # literals
     def test_literals(self):
         self.assertValueParsedCorrectly(r"'C:\Users\nodejs\templates'", r"C:\Users\nodejs\templates")
@@ -46,6 +68,9 @@ class TestParseValue(ParseValueTestCase):
     def test_multiline_literals(self):
         self.assertValueParsedCorrectly(r"'''C:\Users\nodejs\templates'''", r"C:\Users\nodejs\templates")
 
+    def test_multiline_literal_crlf(self):
+        self.assertValueParsedCorrectly("'''hello\r\nworld'''", 'hello\nworld')
+
     def test_quotes_in_multiline_literal(self):
         self.assertValueParsedCorrectly(r"'''Tom \"Dubs\" Preston-Werner'''", r'Tom \"Dubs\" Preston-Werner')
 
@@ -105,6 +130,12 @@ class TestParseArray(ParseValueTestCase):
     def test_two_number_split(self):
         self.assertInvalidToml('[1 2]')
 
+    def test_multiline_strings_array(self):
+        self.assertValueParsedCorrectly('[\n  """one""",\n  \'\'\'two\'\'\',\n]', ['one', 'two'])
+
+    def test_array_of_inline_tables(self):
+        self.assertValueParsedCorrectly('[{a = 1}, {a = 2}]', [InlineTable([('a', 1)]), InlineTable([('a', 2)])])
+
 
 class TestParseInlineTable(ParseValueTestCase):
     def test_empty_table(self):
@@ -122,6 +153,9 @@ class TestParseInlineTable(ParseValueTestCase):
     def test_nested_inline_tables_are_disallowed(self):
         self.assertInvalidToml('{hello = {hello2 = 2}, entry = 3}')
 
+    def test_nested_inline_table_in_last_entry_is_disallowed(self):
+        self.assertInvalidToml('{entry = 3, hello = {hello2 = 2}}')
+
     def test_parse_inline_table_preserves_order(self):
         self.assertValueParsedCorrectly('{one = 1, two = 2, three = 3}',
                                         InlineTable([('one', 1), ('two', 2), ('three', 3)]))
@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from pip_save.toml import profiling
+from pip_save.toml.assemble import parse_toml
+from pip_save.toml.source import Source
+from pip_save.toml.writer import to_toml
+
+TEXT = """
+name = 'pip-save'
+
+[deps]
+django = "==1.10.2"
+"""
+
+
+class TestProfiling(TestCase):
+    def setUp(self):
+        profiling.enable(print_summary=False)
+        profiling.reset()
+
+    def tearDown(self):
+        profiling.disable()
+        profiling.reset()
+
+    def test_counters_and_timings(self):
+        root = parse_toml(TEXT.encode())
+        root['deps']['flask'] = '==0.11'
+        to_toml(root)
+
+        counters = profiling.get_counters()
+        self.assertEqual(counters['change events: Add'], 1)
+        self.assertEqual(counters['bytes scanned'], len(TEXT))
+        self.assertGreater(counters['source calls: expect_match'], 0)
+
+        timings = profiling.get_timings()
+        self.assertEqual(timings['parse KVEntry'][0], 2)
+        self.assertEqual(timings['parse ParsedTable'][0], 1)
+        self.assertEqual(timings['format str'][0], 1)
+        self.assertTrue('parse KVEntry' in profiling.format_summary())
+
+    def test_disable_restores_originals(self):
+        self.assertTrue(profiling.is_enabled())
+        profiling.disable()
+
+        self.assertFalse(profiling.is_enabled())
+        self.assertFalse(hasattr(Source.expect_match, '__wrapped__'))
+        parse_toml(TEXT)
+        self.assertEqual(profiling.get_counters(), {})
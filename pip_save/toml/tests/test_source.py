@@ -1,7 +1,7 @@
 from unittest import TestCase
 
-from pip_save.toml.regex import BASIC_STRING
-from pip_save.toml.source import Source, ExpectationError
+from pip_save.toml.regex import BASIC_STRING, ARRAY_SEPARATOR_TOKEN_REGEX, WHITESPACE_REGEX, ENCLOSING_WHITESPACE_CHARS
+from pip_save.toml.source import Source, ExpectationError, Token
 
 
 class TestSource(TestCase):
@@ -35,4 +35,62 @@ class TestSource(TestCase):
     def test_expect_string_regex_true(self):
         text = '"Hello"'
         s = Source(text)
-        s.expect_regex(BASIC_STRING)
\ No newline at end of file
+        s.expect_regex(BASIC_STRING)
+
+    def test_consume_advances_position(self):
+        s = Source('Hello World')
+        s.expect('Hello')
+
+        self.assertEqual(s.pos, 5)
+        self.assertTrue(s.seek(' World'))
+        self.assertFalse(s.seek('Hello'))
+
+    def test_regex_consumption_ends_after_res_group(self):
+        s = Source('hello"')
+        s.expect_regex(BASIC_STRING)
+
+        self.assertEqual(s.last_consumed, 'hello')
+        self.assertTrue(s.seek('"'))
+        s.expect('"')
+        s.expect_eof()
+
+    # tokens
+    def test_consume_token_skips_whitespace(self):
+        s = Source('  ,\n ]')
+        token = s.consume_token(ARRAY_SEPARATOR_TOKEN_REGEX)
+
+        self.assertEqual(token, Token('comma', ',', 2))
+        self.assertEqual(s.consume_token(ARRAY_SEPARATOR_TOKEN_REGEX), Token('array_end', ']', 5))
+        s.expect_eof()
+
+    def test_expect_token_false(self):
+        s = Source('=')
+        with self.assertRaises(ExpectationError):
+            s.expect_token(ARRAY_SEPARATOR_TOKEN_REGEX)
+
+    def test_next_char_skips_whitespace(self):
+        s = Source(' \t\n[')
+
+        self.assertEqual(s.next_char(WHITESPACE_REGEX), '\n')
+        self.assertEqual(s.next_char(ENCLOSING_WHITESPACE_CHARS), '[')
+        s.expect('[')
+        self.assertEqual(s.next_char(ENCLOSING_WHITESPACE_CHARS), '')
+
+    # error positions
+    def test_line_col(self):
+        s = Source('a = 1\n\nb = 2\n')
+
+        self.assertEqual(s.line_col(0), (1, 1))
+        self.assertEqual(s.line_col(5), (1, 6))
+        self.assertEqual(s.line_col(6), (2, 1))
+        self.assertEqual(s.line_col(11), (3, 5))
+        self.assertEqual(s.line_col(13), (4, 1))
+
+    def test_error_carries_position(self):
+        s = Source('a = 1\nb = ?')
+        s.expect('a = 1\nb = ')
+        with self.assertRaises(ExpectationError) as cm:
+            s.expect('"')
+
+        self.assertEqual(cm.exception.line_col, (2, 5))
+        self.assertEqual(str(cm.exception), '"?" does not contain match for string """ (line 2, column 5)')
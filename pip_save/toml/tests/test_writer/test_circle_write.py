@@ -1,7 +1,10 @@
-from unittest import TestCase
+from io import StringIO
+from unittest import TestCase, mock
 
 from pip_save.toml.assemble import parse_toml
-from pip_save.toml.writer import to_toml
+from pip_save.toml.model import Table
+from pip_save.toml import writer
+from pip_save.toml.writer import to_toml, to_toml_patch, apply_toml_patch, dump, iter_toml
 
 
 class TestWrite(TestCase):
@@ -105,14 +108,193 @@ pair = "shoes"
         """
         self.assertRenderedTheSame(text)
 
-#     def test_newlines(self):
-#         text = """
-# [deps]
-#
-# # hello
-# [dev_deps]
-#
-#
-# [extras]
-#         """
-#         self.assertRenderedTheSame(text)
\ No newline at end of file
+    def test_newlines(self):
+        text = """
+[deps]
+
+# hello
+[dev_deps]
+
+
+[extras]
+        """
+        self.assertRenderedTheSame(text)
+
+
+class TestWriteChanges(TestCase):
+    TEXT = """# formatted by hand
+name    = 'pip-save'   # aligned
+
+[ deps ]
+django  = "==1.10.2"
+flask   = "==0.11"
+
+[dev_deps]
+pytest  = "==3.0"
+"""
+
+    def test_unchanged_document_is_written_verbatim(self):
+        self.assertEqual(to_toml(parse_toml(self.TEXT)), self.TEXT)
+        self.assertEqual(to_toml(parse_toml(self.TEXT.encode())), self.TEXT)
+
+    def test_crlf_is_kept(self):
+        text = self.TEXT.replace('\n', '\r\n')
+        self.assertEqual(to_toml(parse_toml(text)), text)
+
+    def test_crlf_is_used_for_new_lines(self):
+        root = parse_toml('[deps]\r\nx = 1\r\n')
+        root['deps']['y'] = 2
+        root['tools'] = Table()
+
+        self.assertEqual(to_toml(root), '[deps]\r\nx = 1\r\ny = 2\r\n\r\n[tools]\r\n')
+
+    def test_only_changed_statements_are_formatted(self):
+        root = parse_toml(self.TEXT)
+        root['deps']['flask'] = '==0.12'
+
+        self.assertEqual(to_toml(root), self.TEXT.replace('flask   = "==0.11"', 'flask = "==0.12"'))
+
+    def test_added_statements(self):
+        root = parse_toml(self.TEXT)
+        root['deps']['celery'] = '==4.0'
+        root['version'] = '0.1'
+
+        self.assertEqual(to_toml(root), self.TEXT.replace('# aligned\n', '# aligned\nversion = "0.1"\n')
+                                                 .replace('"==0.11"\n', '"==0.11"\ncelery = "==4.0"\n'))
+
+    def test_added_statement_before_the_first_one(self):
+        root = parse_toml('[deps]\nx = 1\n')
+        root['b'] = 2
+
+        self.assertEqual(to_toml(root), 'b = 2\n[deps]\nx = 1\n')
+
+    def test_removed_statements(self):
+        root = parse_toml(self.TEXT)
+        del root['deps']['django']
+
+        self.assertEqual(to_toml(root), self.TEXT.replace('django  = "==1.10.2"\n', ''))
+
+
+class TestWritePatch(TestCase):
+    TEXT = TestWriteChanges.TEXT
+
+    def assertPatchedTo(self, root, expected_text):
+        patched_text = apply_toml_patch(root.original_text, to_toml_patch(root))
+        if isinstance(patched_text, bytes):
+            patched_text = patched_text.decode('utf-8')
+        self.assertEqual(patched_text, expected_text)
+
+    def test_unchanged_document_has_no_edits(self):
+        self.assertEqual(to_toml_patch(parse_toml(self.TEXT)), [])
+
+    def test_implicit_tables_are_not_changes(self):
+        root = parse_toml('[a.b]\nx = 1\n')
+
+        self.assertEqual(root.dirty_nodes, set())
+        self.assertEqual(to_toml_patch(root), [])
+
+    def test_changed_statement_is_replaced(self):
+        root = parse_toml(self.TEXT)
+        root['deps']['flask'] = '==0.12'
+
+        start = self.TEXT.index('flask')
+        self.assertEqual(to_toml_patch(root), [(start, len('flask   = "==0.11"'), 'flask = "==0.12"')])
+        self.assertPatchedTo(root, self.TEXT.replace('flask   = "==0.11"', 'flask = "==0.12"'))
+
+    def test_added_statements(self):
+        root = parse_toml(self.TEXT.encode())
+        root['deps']['celery'] = '==4.0'
+        root['deps']['requests'] = '==2.11'
+        root['tools'] = Table()
+
+        self.assertEqual(len(to_toml_patch(root)), 2)
+        self.assertPatchedTo(root, self.TEXT.replace('"==0.11"\n', '"==0.11"\ncelery = "==4.0"\nrequests = "==2.11"\n')
+                             + '\n[tools]\n')
+
+    def test_added_statement_before_the_first_one(self):
+        root = parse_toml('[deps]\nx = 1\n')
+        root['b'] = 2
+
+        self.assertEqual(to_toml(root), 'b = 2\n[deps]\nx = 1\n')
+
+    def test_removed_statements(self):
+        root = parse_toml(self.TEXT)
+        del root['deps']['django']
+        del root['name']
+
+        self.assertPatchedTo(root, self.TEXT.replace('django  = "==1.10.2"\n', '')
+                                            .replace("name    = 'pip-save'", ''))
+
+    def test_removed_and_added_back(self):
+        root = parse_toml(self.TEXT)
+        del root['dev_deps']['pytest']
+        root['dev_deps']['pytest'] = '==3.1'
+
+        self.assertPatchedTo(root, self.TEXT.replace('pytest  = "==3.0"', 'pytest = "==3.1"'))
+
+    def test_crlf_lines_are_removed(self):
+        text = self.TEXT.replace('\n', '\r\n')
+        root = parse_toml(text)
+        del root['deps']['django']
+
+        self.assertPatchedTo(root, text.replace('django  = "==1.10.2"\r\n', ''))
+
+    def test_crlf_is_used_for_new_lines(self):
+        root = parse_toml(b'[deps]\r\nx = 1\r\n')
+        root['deps']['y'] = 2
+        root['version'] = '0.1'
+
+        self.assertPatchedTo(root, 'version = "0.1"\r\n\r\n[deps]\r\nx = 1\r\ny = 2\r\n')
+
+    def test_empty_document(self):
+        root = parse_toml('')
+        root['deps'] = Table()
+        root['deps']['django'] = '==1.10.2'
+
+        self.assertPatchedTo(root, '[deps]\ndjango = "==1.10.2"\n')
+
+
+class TestDump(TestCase):
+    TEXT = TestWriteChanges.TEXT
+
+    def test_dump(self):
+        root = parse_toml(self.TEXT)
+        root['deps']['celery'] = '==4.0'
+        fp = StringIO()
+        dump(root, fp)
+
+        self.assertEqual(fp.getvalue(), to_toml(root))
+
+    @mock.patch.object(writer, 'WRITE_CHUNK_SIZE', 8)
+    def test_unchanged_text_is_written_by_chunks(self):
+        text = self.TEXT.replace('pip-save', 'pip-säve-ü')
+        root = parse_toml(text.encode())
+        chunks = list(iter_toml(root))
+
+        self.assertEqual(''.join(chunks), text)
+        self.assertTrue(all(len(chunk.encode()) <= 8 for chunk in chunks))
+
+
+class TestFormattedStatementsCache(TestCase):
+    TEXT = TestWriteChanges.TEXT
+
+    def test_only_changed_statements_are_formatted_again(self):
+        # parsed from a file object, the document has no original text
+        root = parse_toml(StringIO(self.TEXT))
+        text = to_toml(root)
+
+        with mock.patch.object(writer, 'format_value', wraps=writer.format_value) as format_value:
+            root['deps']['flask'] = '==0.12'
+            root['deps']['celery'] = '==4.0'
+            new_text = to_toml(root)
+
+        self.assertEqual(format_value.call_count, 2)
+        self.assertEqual(new_text, text.replace('flask = "==0.11"\n', 'flask = "==0.12"\ncelery = "==4.0"\n'))
+
+    def test_removed_statements_are_dropped(self):
+        root = parse_toml(StringIO(self.TEXT))
+        to_toml(root)
+        del root['deps']['flask']
+
+        self.assertTrue(('deps', 'flask') not in root.formatted_statements)
+        self.assertTrue(('deps', 'django') in root.formatted_statements)
@@ -16,3 +16,6 @@ class TestFormatValue(TestCase):
 
     def test_complex_keyword(self):
         self.assertFormatted('hello world', '"hello world"')
+
+    def test_keyword_with_quotes(self):
+        self.assertFormatted('say "hi"', r'"say \"hi\""')
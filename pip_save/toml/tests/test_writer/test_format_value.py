@@ -28,6 +28,7 @@ class TestFormatValue(TestCase):
         self.assertFormatted('maxim', '"maxim"')
         self.assertFormatted(r'C:\templates', r'"C:\\templates"')
         self.assertFormatted('\n\n', r'"\n\n"')
+        self.assertFormatted('say "hi"\t\x01', r'"say \"hi\"\t\u0001"')
 
     def test_format_list(self):
         self.assertFormatted([], '[]')
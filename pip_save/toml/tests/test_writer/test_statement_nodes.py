@@ -1,3 +1,4 @@
+import pickle
 from collections import OrderedDict
 from unittest import TestCase
 
@@ -30,3 +31,97 @@ class TestStatementNodes(TestCase):
         toml_nodes.insert_before(('django',), ('flask',), '1.3')
         self.assertEqual(toml_nodes.keys(), [('deps',), ('flask',), ('django',)])
 
+    def test_delete_keeps_order(self):
+        toml_nodes = TomlStatementNodes()
+        for key in ['a', 'b', 'c']:
+            toml_nodes[(key,)] = key
+
+        del toml_nodes[('b',)]
+        toml_nodes.insert_after(('a',), ('d',), 'd')
+        self.assertEqual(toml_nodes.items(), [(('a',), 'a'), (('d',), 'd'), (('c',), 'c')])
+        self.assertEqual(len(toml_nodes), 3)
+
+    def test_insert_node_before_the_next_one(self):
+        toml_nodes = TomlStatementNodes()
+        for key in ['a', 'b', 'c']:
+            toml_nodes[(key,)] = key
+
+        # the node is linked after itself
+        toml_nodes.insert_before(('b',), ('a',), 10)
+        self.assertEqual(toml_nodes.items(), [(('a',), 10), (('b',), 'b'), (('c',), 'c')])
+        self.assertEqual(len(toml_nodes), 3)
+
+    def test_add_root_keyword_before_first_table(self):
+        toml_nodes = TomlStatementNodes()
+        toml_nodes[('name',)] = 'pip-save'
+        toml_nodes[('deps',)] = Table()
+        toml_nodes[('dev_deps',)] = Table()
+
+        toml_nodes.add_root_keyword('version', '0.1')
+        self.assertEqual(toml_nodes.keys(), [('name',), ('version',), ('deps',), ('dev_deps',)])
+
+    def test_add_table_keyword_to_the_middle_table(self):
+        toml_nodes = TomlStatementNodes()
+        toml_nodes[('deps',)] = Table()
+        toml_nodes[('deps', 'django')] = '1.10.2'
+        toml_nodes[('dev_deps',)] = Table()
+        toml_nodes[('dev_deps', 'pytest')] = '3.0'
+
+        toml_nodes.add_table_keyword(('deps',), 'flask', '0.11')
+        self.assertEqual(toml_nodes.keys(), [('deps',), ('deps', 'django'), ('deps', 'flask'),
+                                             ('dev_deps',), ('dev_deps', 'pytest')])
+
+    def test_pickle_big_document(self):
+        toml_nodes = TomlStatementNodes()
+        for i in range(100000):
+            toml_nodes[('key{}'.format(i),)] = i
+
+        self.assertEqual(pickle.loads(pickle.dumps(toml_nodes)).items(), toml_nodes.items())
+
+    def test_add_table_keyword_after_removed_last_keyword(self):
+        toml_nodes = TomlStatementNodes()
+        toml_nodes[('deps',)] = Table()
+        toml_nodes[('deps', 'django')] = '1.10.2'
+        toml_nodes[('dev_deps',)] = Table()
+
+        del toml_nodes[('deps', 'django')]
+        toml_nodes.add_table_keyword(('deps',), 'flask', '0.11')
+        toml_nodes.add_root_keyword('name', 'pip-save')
+        self.assertEqual(toml_nodes.keys(), [('name',), ('deps',), ('deps', 'flask'), ('dev_deps',)])
+
+    def test_insert_table_splits_the_table(self):
+        toml_nodes = TomlStatementNodes()
+        toml_nodes[('deps',)] = Table()
+        toml_nodes[('deps', 'django')] = '1.10.2'
+        toml_nodes[('deps', 'flask')] = '0.11'
+
+        toml_nodes.insert_after(('deps', 'django'), ('dev_deps',), Table())
+        toml_nodes.add_table_keyword(('deps',), 'celery', '4.0')
+        toml_nodes.add_table_keyword(('dev_deps',), 'pytest', '3.0')
+        self.assertEqual(toml_nodes.keys(), [('deps',), ('deps', 'django'), ('deps', 'celery'),
+                                             ('dev_deps',), ('deps', 'flask'), ('dev_deps', 'pytest')])
+
+    def test_table_items(self):
+        toml_nodes = TomlStatementNodes()
+        toml_nodes[('name',)] = 'pip-save'
+        toml_nodes[('deps',)] = Table()
+        toml_nodes[('deps', 'flask')] = '0.11'
+        toml_nodes[('dev_deps',)] = Table()
+        toml_nodes.insert_before(('deps', 'flask'), ('deps', 'django'), '1.10.2')
+
+        self.assertEqual(list(toml_nodes.table_items(())), [(('name',), 'pip-save')])
+        self.assertEqual(list(toml_nodes.table_items(('deps',))), [(('deps', 'django'), '1.10.2'),
+                                                                   (('deps', 'flask'), '0.11')])
+        self.assertEqual(list(toml_nodes.table_items(('dev_deps',))), [])
+
+    def test_removed_table_body_joins_previous_table(self):
+        toml_nodes = TomlStatementNodes()
+        toml_nodes[('deps',)] = Table()
+        toml_nodes[('dev_deps',)] = Table()
+        toml_nodes[('dev_deps', 'pytest')] = '3.0'
+
+        del toml_nodes[('dev_deps',)]
+        toml_nodes.add_table_keyword(('deps',), 'django', '1.10.2')
+        self.assertEqual(toml_nodes.keys(), [('deps',), ('dev_deps', 'pytest'), ('deps', 'django')])
+        with self.assertRaises(KeyError):
+            toml_nodes.add_table_keyword(('dev_deps',), 'nose', '1.0')
@@ -1,25 +1,37 @@
-from io import StringIO
-from typing import List, Tuple, Union
+from functools import lru_cache
+from typing import IO, Iterator, List, Optional, Tuple, Union
 
-from pip_save.toml.model import Root, NotSupported, Table
+from pip_save.toml.model import Root, NotSupported, Table, UnparsedTable
 from pip_save.toml.parser import ValueType, Comment, InlineTable
-from pip_save.toml.regex import KEYWORD_REGEX
+from pip_save.toml.regex import KEYWORD_REGEX, ESCAPED_CHARS_REGEX, LITERAL_STRING_INVALID_CHARS_REGEX
 
 
 _escapes = {'\n': 'n', '\r': 'r', '\\': '\\', '\t': 't', '\b': 'b', '\f': 'f', '"': '"'}
 
+# backslash goes first, the other escapes add backslashes
+_ESCAPE_REPLACEMENTS = sorted(((char, '\\' + escape) for char, escape in _escapes.items()),
+                              key=lambda replacement: replacement[0] != '\\')
+# the rest of the control chars, they can't be in a basic string either
+_CONTROL_CHARS_TABLE = {code: '\\u{:04x}'.format(code) for code in range(0x20)}
+
+# formatted keywords and table names, the same keys repeat across the tables
+FORMAT_CACHE_SIZE = 4096
+
 
 def _escape_string(s: str) -> str:
-    result = []
+    if ESCAPED_CHARS_REGEX.search(s) is None:
+        return '"' + s + '"'
 
-    for char in s:
-        if char in _escapes.keys():
-            result.append('\\' + _escapes[char])
-            continue
+    # str.replace for the common escapes, it's several times faster than str.translate
+    # with multi-char replacements
+    for char, escape in _ESCAPE_REPLACEMENTS:
+        if char in s:
+            s = s.replace(char, escape)
 
-        result.append(char)
+    if LITERAL_STRING_INVALID_CHARS_REGEX.search(s) is not None:
+        s = s.translate(_CONTROL_CHARS_TABLE)
 
-    return '"{}"'.format(''.join(result))
+    return '"' + s + '"'
 
 
 def _format_list(lst: List[ValueType]) -> str:
@@ -66,24 +78,18 @@ def format_value(val: ValueType) -> str:
 
 
 def trace_node_val(name: Tuple[str, ...], root: Root) -> Union[ValueType, Table, Comment]:
-    current_table = root.nodes
-    val = None
-    for part in name:
-        val = current_table[part]
-        if isinstance(val, Table):
-            current_table = val
-
-    return val
+    return root.get_path(name)
 
 
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
 def format_keyword(key: str) -> str:
-    match = KEYWORD_REGEX.match(key)
-    if not match or match.group() != key:
-        return '"{key}"'.format(key=key)
+    if KEYWORD_REGEX.fullmatch(key) is None:
+        return _escape_string(key)
 
     return key
 
 
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
 def format_table_name(name: Tuple[str, ...]) -> str:
     parts = []
     for part in name:
@@ -96,33 +102,261 @@ def format_kv_entry(key: str, val: ValueType) -> str:
     return format_keyword(key) + ' = ' + format_value(val)
 
 
-def to_toml(root: Root) -> str:
-    output = StringIO()
+def _original_slice(original_text: Union[str, bytes], start: int, end: int) -> str:
+    text = original_text[start:end]
+    if isinstance(text, bytes):
+        return text.decode('utf-8')
+
+    return text
+
+
+def _format_statement(node_name: Tuple[str, ...], val) -> str:
+    if isinstance(val, Table):
+        if isinstance(val, UnparsedTable):
+            return val.text
+
+        return format_table_name(node_name)
+
+    if node_name[-1].startswith('#'):  # comment
+        return '#' + val
+
+    # keyword
+    return format_keyword(node_name[-1]) + ' = ' + format_value(val)
+
+
+def _format_statement_cached(root: Root, node_name: Tuple[str, ...], val) -> str:
+    # text of the statement is reused until its value changes, the same value object means
+    # the same text (values changed in place are not seen)
+    cached = root.formatted_statements.get(node_name)
+    if cached is not None and cached[0] is val:
+        return cached[1]
+
+    text = _format_statement(node_name, val)
+    root.formatted_statements[node_name] = (val, text)
+    return text
+
+
+def _line_break(original_text: Union[str, bytes, None]) -> str:
+    # line break of the first line of the original text, the new lines get the same one
+    if isinstance(original_text, bytes):
+        end = original_text.find(b'\n')
+        return '\r\n' if end > 0 and original_text[end - 1:end] == b'\r' else '\n'
+
+    if isinstance(original_text, str):
+        end = original_text.find('\n')
+        return '\r\n' if end > 0 and original_text[end - 1:end] == '\r' else '\n'
+
+    return '\n'
+
+
+# unchanged text is copied and written in pieces of about this size (in characters or bytes)
+WRITE_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_original_slices(original_text: Union[str, bytes], start: int, end: int) -> Iterator[str]:
+    while end - start > WRITE_CHUNK_SIZE:
+        chunk_end = start + WRITE_CHUNK_SIZE
+        if isinstance(original_text, bytes):
+            # UTF-8 sequences are never split
+            while original_text[chunk_end] & 0xC0 == 0x80:
+                chunk_end -= 1
+
+        yield _original_slice(original_text, start, chunk_end)
+        start = chunk_end
+
+    if start < end:
+        yield _original_slice(original_text, start, end)
+
+
+def iter_toml(root: Root) -> Iterator[str]:
+    # The document piece by piece, one statement or a run of unchanged text at a time.
+    # Statements, which are unchanged since parsing, are copied from the original text together with
+    # the whitespace before them, unless something was removed in between. The rest is formatted.
+    original_text = root.original_text
+    line_break = _line_break(original_text)
+    first_statement = True
     first_table = True
-    for node_name, val in root.statement_nodes.items():
+    # end of the last unchanged statement in the original text
+    last_end = 0 if original_text is not None else None
+    # original text from run_start to last_end is not written yet
+    run_start = None  # type: Optional[int]
+    # a statement is formatted after last_end, the original text from there has to start a new line
+    is_formatted_after_end = False
+    for node_name, val, span in root.statement_nodes.items_with_spans():
         # val = trace_node_val(node_name, root)
         if val is None:
             raise KeyError
 
-        if isinstance(val, Table):
+        is_table = isinstance(val, Table)
+        if span is not None and last_end is not None and last_end <= span[0]:
+            gap = _original_slice(original_text, last_end, span[0])
+            if (not gap or gap.isspace()) and (not is_formatted_after_end or '\n' in gap):
+                if run_start is None:
+                    run_start = last_end
+                last_end = span[1]
+                is_formatted_after_end = False
+                first_statement = False
+                first_table = first_table and not is_table
+                continue
+
+        if run_start is not None:
+            yield from _iter_original_slices(original_text, run_start, last_end)
+            run_start = None
+
+        if not first_statement:
+            yield line_break
+        first_statement = False
+
+        if is_table:
             if not first_table:
-                output.write('\n')
+                yield line_break
             else:
                 first_table = False
 
-            output.write(format_table_name(node_name))
+        if span is not None:
+            run_start, last_end = span
+            is_formatted_after_end = False
+        else:
+            yield _format_statement_cached(root, node_name, val)
+            is_formatted_after_end = True
+
+    if run_start is not None:
+        # the rest of the document, if it's only whitespace (e.g. the last line break)
+        trailing_text = _original_slice(original_text, last_end, len(original_text))
+        if trailing_text.isspace():
+            yield from _iter_original_slices(original_text, run_start, len(original_text))
+            return
+
+        yield from _iter_original_slices(original_text, run_start, last_end)
+
+    if not first_statement:
+        yield line_break
+
+
+def dump(root: Root, fp: IO[str]) -> None:
+    # small pieces are joined, so that the file gets writes of about WRITE_CHUNK_SIZE
+    buffer = []  # type: List[str]
+    buffered_size = 0
+    for text in iter_toml(root):
+        buffer.append(text)
+        buffered_size += len(text)
+        if buffered_size >= WRITE_CHUNK_SIZE:
+            fp.write(''.join(buffer))
+            buffer = []
+            buffered_size = 0
+
+    if buffer:
+        fp.write(''.join(buffer))
+
+
+def to_toml(root: Root) -> str:
+    return ''.join(iter_toml(root))
+
+
+# (offset, length of the replaced text, new text), offsets are in the units of the original text
+TomlEdit = Tuple[int, int, str]
 
-        elif node_name[-1].startswith('#'):  # comment
-            output.write('#' + val)
 
+def _removed_statement_range(original_text: Union[str, bytes], start: int, end: int) -> Tuple[int, int]:
+    # the whole line with its line break, if the statement is the only thing on it
+    if isinstance(original_text, bytes):
+        blank_chars, line_breaks = (b' ', b'\t'), (b'\n', b'\r\n')
+    else:
+        blank_chars, line_breaks = (' ', '\t'), ('\n', '\r\n')
+
+    line_start = start
+    while line_start > 0 and original_text[line_start - 1:line_start] in blank_chars:
+        line_start -= 1
+    if line_start > 0 and original_text[line_start - 1:line_start] != line_breaks[0]:
+        return start, end
+
+    line_end = end
+    while original_text[line_end:line_end + 1] in blank_chars:
+        line_end += 1
+    for line_break in line_breaks:
+        if original_text[line_end:line_end + len(line_break)] == line_break:
+            return line_start, line_end + len(line_break)
+
+    if line_end < len(original_text):
+        return start, end
+
+    return line_start, line_end
+
+
+def _insertion_text(statements: List[Tuple[bool, str]], is_document_start: bool, line_break: str = '\n') -> str:
+    # statements are (is_table, text), every one goes on its own line, tables after an empty line
+    parts = []
+    for is_table, text in statements:
+        if parts or not is_document_start:
+            parts.append(line_break * 2 if is_table else line_break)
+        parts.append(text)
+
+    if is_document_start:
+        parts.append(line_break)
+    return ''.join(parts)
+
+
+def to_toml_patch(root: Root) -> List[TomlEdit]:
+    # Edits, which apply the changes of the root to its original text (see apply_toml_patch): changed
+    # statements are replaced, removed ones are cut out, new ones are inserted after the previous
+    # statement of the original text. The rest of the text is left as is. No edits, if nothing changed.
+    if not root.dirty_nodes:
+        return []
+
+    original_text = root.original_text
+    if original_text is None:
+        raise NotSupported('Document without the original text can\'t be patched.')
+
+    line_break = _line_break(original_text)
+    edits = []  # type: List[TomlEdit]
+    for start, end in root.statement_nodes.removed_spans():
+        start, end = _removed_statement_range(original_text, start, end)
+        edits.append((start, end - start, ''))
+
+    # new statements after the same statement of the original text are inserted by a single edit
+    anchor_end = None  # type: Optional[int]
+    new_statements = []  # type: List[Tuple[bool, str]]
+    for node_name, val, span, is_changed in root.statement_nodes.items_with_original_spans():
+        if span is None:
+            new_statements.append((isinstance(val, Table), _format_statement_cached(root, node_name, val)))
+            continue
+
+        if new_statements:
+            if anchor_end is None:
+                text = _insertion_text(new_statements, is_document_start=True, line_break=line_break)
+                if isinstance(val, Table):
+                    text += line_break
+                edits.append((0, 0, text))
+            else:
+                edits.append((anchor_end, 0, _insertion_text(new_statements, is_document_start=False,
+                                                             line_break=line_break)))
+            new_statements = []
+
+        anchor_end = span[1]
+        if is_changed:
+            edits.append((span[0], span[1] - span[0], _format_statement_cached(root, node_name, val)))
+
+    if new_statements:
+        if anchor_end is None:
+            edits.append((len(original_text), 0, _insertion_text(new_statements, is_document_start=True,
+                                                                 line_break=line_break)))
         else:
-            # keyword
-            output.write(format_keyword(node_name[-1]))
-            output.write(' = ')
-            output.write(format_value(val))
+            edits.append((anchor_end, 0, _insertion_text(new_statements, is_document_start=False,
+                                                         line_break=line_break)))
+
+    # insertions go before the removals at the same offset
+    edits.sort(key=lambda edit: (edit[0], edit[1]))
+    return edits
 
-        output.write('\n')
 
-    result_toml = output.getvalue()
-    output.close()
-    return result_toml
+def apply_toml_patch(original_text: Union[str, bytes], edits: List[TomlEdit]) -> Union[str, bytes]:
+    # result is of the same type as the original text
+    parts = []
+    pos = 0
+    for offset, old_len, new_text in edits:
+        parts.append(original_text[pos:offset])
+        parts.append(new_text.encode('utf-8') if isinstance(original_text, bytes) else new_text)
+        pos = offset + old_len
+
+    parts.append(original_text[pos:])
+    return original_text[:0].join(parts)